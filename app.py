@@ -1,11 +1,12 @@
 import logging
 from threading import Thread
-from telegram.ext import ApplicationBuilder
 
-from config import BOT_TOKEN
-from bot.handlers import register_handlers
+from config import API_LISTEN, API_PORT, RUN_MODE
+from bot.application import build_application
 from utils.schedule_tasks import init_scheduler
 from utils.app import create_app as create_flask_app
+from utils.async_db import init_async_db
+from utils.outbox import outbox
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -15,19 +16,26 @@ logger = logging.getLogger(__name__)
 
 
 def _run_api(app):
-    app.run(host="127.0.0.1", port=5000, debug=False)
+    app.run(host=API_LISTEN, port=API_PORT, debug=False)
 
 
 def main():
+    if RUN_MODE == "webhook":
+        from bot.webhook import run_webhook
+
+        logger.info("Старт в режиме webhook")
+        run_webhook()
+        return
+
     logger.info("Старт API и бота")
     flask_app = create_flask_app()
     flask_app.app_context().push()
+    init_async_db(flask_app)
     Thread(target=_run_api, args=(flask_app,), daemon=True).start()
-    logger.info("API запущен на http://127.0.0.1:5000")
+    logger.info("API запущен на http://%s:%s", API_LISTEN, API_PORT)
 
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
-    register_handlers(app)
-    init_scheduler(app.bot, flask_app)
+    app = build_application()
+    init_scheduler(outbox, flask_app)
     logger.info("Запуск polling")
     app.run_polling()
 
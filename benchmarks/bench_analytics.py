@@ -0,0 +1,125 @@
+"""Отчёт за период: цикл по ORM-объектам, цикл по дневной сводке и NumPy.
+
+Для одного пользователя с N транзакциями за два года считаются тренд баланса,
+расходы по категориям и суммы по месяцам за последние --days дней.
+
+    python -m benchmarks.bench_analytics --rows 10000,100000,1000000 --days 365
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.aggregates import daily_net, totals_by_category
+from utils.analytics import parse_period, period_report
+from utils.app import create_app
+from utils.helpers import _category_cache, _user_cache, get_categories, get_or_create_user
+from utils.models import CategoryType, Transaction
+from utils.rollups import rebuild
+
+
+def populate(path, rows):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with app.app_context():
+        user = get_or_create_user(1)
+        categories = [(c.id, c.type.value) for c in get_categories(user)]
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO "transaction" (user_id, amount, type, category_id, timestamp) VALUES (?, ?, ?, ?, ?)',
+        (
+            (user.id, random.randint(100, 500_000), ctype, cid,
+             (now - timedelta(seconds=random.randint(0, 2 * 365 * 86400))).isoformat(" "))
+            for cid, ctype in random.choices(categories, k=rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+    with app.app_context():
+        rebuild(user.id)
+    return app, user
+
+
+def orm_loop(user, start, end):
+    # Так отчёт считался до сводки: все транзакции периода как ORM-объекты и цикл в Python.
+    transactions = (
+        Transaction.query.filter_by(user_id=user.id)
+        .filter(Transaction.timestamp >= datetime.combine(start, datetime.min.time()))
+        .filter(Transaction.timestamp < datetime.combine(end, datetime.min.time()))
+        .order_by(Transaction.timestamp)
+        .all()
+    )
+    net, by_category, by_month = {}, {}, {}
+    for txn in transactions:
+        day = txn.timestamp.date()
+        signed = txn.amount if txn.type == CategoryType.income else -txn.amount
+        net[day] = net.get(day, 0) + signed
+        if txn.type == CategoryType.expense:
+            name = txn.category.name if txn.category else "Без категории"
+            by_category[name] = by_category.get(name, 0) + txn.amount
+            month = day.strftime("%Y-%m")
+            by_month[month] = by_month.get(month, 0) + txn.amount
+    return _cumulative(net, start, end), by_category, by_month
+
+
+def rollup_loop(user, start, end):
+    # Текущая реализация до NumPy: агрегаты из daily_rollup и цикл по дням.
+    net = dict(daily_net(user.id, start, end))
+    by_month = {}
+    for day, value in net.items():
+        if value < 0:
+            by_month[day.strftime("%Y-%m")] = by_month.get(day.strftime("%Y-%m"), 0) - value
+    return _cumulative(net, start, end), totals_by_category(user.id, start, end), by_month
+
+
+def _cumulative(net, start, end):
+    trend, total = [], 0
+    for i in range((end - start).days):
+        day = start + timedelta(days=i)
+        total += net.get(day, 0)
+        trend.append((day, total / 100))
+    return trend
+
+
+def vectorized(user, start, end):
+    return period_report(user.id, start, end)
+
+
+VARIANTS = {"orm-loop": orm_loop, "rollup-loop": rollup_loop, "numpy": vectorized}
+
+
+def measure(app, func, user, period, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        with app.app_context():
+            started = time.perf_counter()
+            func(user, *period)
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="10000,100000,1000000")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    period = parse_period(str(args.days))
+    for rows in (int(r) for r in args.rows.split(",")):
+        _user_cache.clear()
+        _category_cache.clear()
+        app, user = populate(os.path.join(tempfile.mkdtemp(), "analytics.db"), rows)
+        # Прогрев: импорт numpy и первое соединение не входят в замер.
+        measure(app, vectorized, user, period, 1)
+        for name, func in VARIANTS.items():
+            repeat = 1 if name == "orm-loop" and rows >= 1_000_000 else args.repeat
+            elapsed = measure(app, func, user, period, repeat)
+            print(f"{rows:>9} строк  {name:<12} {elapsed * 1000:10.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
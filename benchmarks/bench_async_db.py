@@ -0,0 +1,118 @@
+"""Пропускная способность обработчиков бота: синхронный доступ к БД против run_db.
+
+    python -m benchmarks.bench_async_db --users 50 --updates 20 --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import bot.commands as commands
+from utils.app import create_app
+from utils.async_db import init_async_db, shutdown_async_db
+from utils.database import db
+from utils.helpers import get_or_create_user
+from utils.models import Category, Transaction
+
+
+class FakeMessage:
+    def __init__(self, text, latency):
+        self.text = text
+        self.latency = latency
+
+    async def reply_text(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+
+    async def reply_photo(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+
+    async def reply_document(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+
+
+def fake_update(tg_id, text="Показать баланс", latency=0.02):
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=tg_id),
+        message=FakeMessage(text, latency),
+    )
+
+
+def populate(app, users, rows):
+    with app.app_context():
+        now = datetime.utcnow()
+        per_user = max(rows // users, 1)
+        for tg_id in range(1, users + 1):
+            user = get_or_create_user(tg_id)
+            cats = Category.query.filter_by(user_id=user.id).all()
+            db.session.bulk_insert_mappings(Transaction, [
+                {
+                    "user_id": user.id,
+                    "amount": random.randint(1_000, 500_000),
+                    "type": cat.type,
+                    "category_id": cat.id,
+                    "timestamp": now - timedelta(minutes=random.randint(0, 60 * 24 * 60)),
+                }
+                for cat in random.choices(cats, k=per_user)
+            ])
+            db.session.commit()
+
+
+async def run_inline(app, func, *args, **kwargs):
+    with app.app_context():
+        return func(*args, **kwargs)
+
+
+async def heartbeat(stop, interval=0.005):
+    worst = 0.0
+    while not stop.is_set():
+        tick = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - tick - interval)
+    return worst
+
+
+async def drive(users, updates):
+    async def one_user(tg_id):
+        for _ in range(updates):
+            await commands.show_balance(fake_update(tg_id), SimpleNamespace(user_data={}))
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(heartbeat(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one_user(tg_id) for tg_id in range(1, users + 1)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return users * updates / elapsed, await lag
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    populate(app, args.users, args.rows)
+
+    original = commands.run_db
+    commands.run_db = lambda func, *a, **kw: run_inline(app, func, *a, **kw)
+    before = asyncio.run(drive(args.users, args.updates))
+    commands.run_db = original
+
+    init_async_db(app)
+    after = asyncio.run(drive(args.users, args.updates))
+    shutdown_async_db()
+
+    print(f"users={args.users} updates/user={args.updates} rows={args.rows}")
+    print(f"синхронно на event loop: {before[0]:8.1f} updates/s, макс. блокировка loop {before[1] * 1000:6.1f} мс")
+    print(f"run_db (пул потоков):    {after[0]:8.1f} updates/s, макс. блокировка loop {after[1] * 1000:6.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Последовательная и параллельная обработка апдейтов с сохранением порядка по пользователю.
+
+Один пользователь запрашивает XLSX-экспорт большой истории, остальные в это время
+проходят диалог «Добавить расход» → сумма → категория и смотрят баланс. Замеряется
+время ответа на «Показать баланс» у лёгких пользователей и проверяется, что все
+диалоги завершились (то есть шаги одного пользователя не перепутались).
+
+    python -m benchmarks.bench_concurrency --users 100 --rows 100000 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from benchmarks.bench_async_db import populate
+from benchmarks.bench_persistence import percentile
+from benchmarks.fake_telegram import FakeTelegramAPI, text_update
+from bot.application import build_application
+from utils.app import create_app
+from utils.async_db import init_async_db, shutdown_async_db
+from utils.database import db
+from utils.helpers import _category_cache, _user_cache
+from utils.models import Transaction
+from utils.money import to_minor
+
+TOKEN = "123456:TEST"
+HEAVY_USER = 1
+STEPS = ["Добавить расход", "100", "Еда", "Показать баланс"]
+
+
+def light_user(i):
+    return 1000 + i
+
+
+async def run(api, users, concurrency):
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=False,
+                                    concurrency=concurrency)
+    queued, done = {}, {}
+
+    async def record(update, context):
+        done[update.update_id] = time.perf_counter()
+
+    application.add_handler(TypeHandler(Update, record), group=1)
+
+    async def put(update_id, user_id, text):
+        queued[update_id] = time.perf_counter()
+        await application.update_queue.put(Update.de_json(text_update(update_id, user_id, text), application.bot))
+
+    async with application:
+        await application.start()
+        for i in range(users):
+            await put(i + 1, light_user(i), "/start")
+        await application.update_queue.join()
+
+        balance_ids = []
+        update_id = users
+        started = time.perf_counter()
+        update_id += 1
+        await put(update_id, HEAVY_USER, "Экспорт в XLSX")
+        for text in STEPS:
+            for i in range(users):
+                update_id += 1
+                await put(update_id, light_user(i), text)
+                if text == "Показать баланс":
+                    balance_ids.append(update_id)
+        await application.update_queue.join()
+        elapsed = time.perf_counter() - started
+        await application.stop()
+    latencies = [done[uid] - queued[uid] for uid in balance_ids]
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(latency=args.api_latency)
+    for concurrency in (1, args.concurrency):
+        _user_cache.clear()
+        _category_cache.clear()
+        path = os.path.join(tempfile.mkdtemp(), "concurrency.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+        populate(app, 1, args.rows)
+        with app.app_context():
+            init_async_db(app)
+            latencies, elapsed = asyncio.run(run(api, args.users, concurrency))
+            shutdown_async_db()
+            created = db.session.query(Transaction).filter(Transaction.amount == to_minor(100)).count()
+        print(
+            f"concurrency={concurrency:<3} баланс p50 {statistics.median(latencies) * 1000:8.1f} мс  "
+            f"p95 {percentile(latencies, 95) * 1000:8.1f} мс  всего {elapsed:6.2f} с  "
+            f"диалогов завершено {created}/{args.users}"
+        )
+    api.close()
+
+
+if __name__ == "__main__":
+    main()
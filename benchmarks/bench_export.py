@@ -0,0 +1,131 @@
+"""Экспорт транзакций одного пользователя: время, строк/с и пиковый RSS.
+
+Каждый вариант запускается в отдельном процессе, чтобы ru_maxrss не смешивался.
+
+    python -m benchmarks.bench_export --rows 1000000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.app import create_app
+from utils.helpers import BOM, export_transactions_csv, export_transactions_excel, get_or_create_user
+from utils.models import Transaction
+from utils.money import format_minor, from_minor
+
+
+def legacy_csv(user):
+    buffer = io.StringIO()
+    buffer.write(BOM)
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(["ID", "Сумма", "Тип", "Категория", "Дата/Время"])
+    for t in Transaction.query.filter_by(user_id=user.id).order_by(Transaction.timestamp).all():
+        writer.writerow([t.id, format_minor(t.amount), t.type.value, t.category.name,
+                         t.timestamp.strftime("%Y-%m-%d %H:%M:%S")])
+    bio = io.BytesIO(buffer.getvalue().encode('utf-8'))
+    bio.seek(0)
+    return bio
+
+
+def legacy_excel(user):
+    import pandas as pd
+
+    rows = Transaction.query.filter_by(user_id=user.id).order_by(Transaction.timestamp).all()
+    records = [
+        {'ID': t.id, 'Сумма': from_minor(t.amount), 'Тип': t.type.value, 'Категория': t.category.name,
+         'Дата/Время': t.timestamp}
+        for t in rows
+    ]
+    df = pd.DataFrame(records)
+    df['Сумма'] = df['Сумма'].map(lambda x: f"{x:.2f}")
+    df['Дата/Время'] = pd.to_datetime(df['Дата/Время']).dt.strftime("%Y-%m-%d %H:%M:%S")
+    bio = io.BytesIO()
+    with pd.ExcelWriter(bio, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Transactions')
+    bio.seek(0)
+    return bio
+
+
+VARIANTS = {
+    "csv-legacy": legacy_csv,
+    "csv-stream": export_transactions_csv,
+    "xlsx-pandas": legacy_excel,
+    "xlsx-stream": export_transactions_excel,
+}
+
+
+def generate(path, rows):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with app.app_context():
+        user = get_or_create_user(1)
+        category_ids = [c.id for c in user.categories]
+    conn = sqlite3.connect(path)
+    start = datetime.utcnow() - timedelta(days=5 * 365)
+    conn.executemany(
+        'INSERT INTO "transaction" (user_id, amount, type, category_id, timestamp) VALUES (1, ?, ?, ?, ?)',
+        (
+            (random.randint(100, 500_000), "expense" if cid <= 3 else "income", cid,
+             (start + timedelta(seconds=i * 150)).isoformat(" "))
+            for i, cid in enumerate(random.choices(category_ids, k=rows))
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_variant(path, variant):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with app.app_context():
+        user = get_or_create_user(1)
+        started = time.perf_counter()
+        out = VARIANTS[variant](user)
+        out.seek(0, os.SEEK_END)
+        size = out.tell()
+        elapsed = time.perf_counter() - started
+        rows = Transaction.query.filter_by(user_id=user.id).count()
+    print(json.dumps({
+        "variant": variant,
+        "rows": rows,
+        "seconds": elapsed,
+        "bytes": size,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--db")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_variant(args.db, args.run)
+        return
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "export.db")
+    if not args.db:
+        generate(path, args.rows)
+    for variant in args.variants.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_export", "--db", path, "--run", variant],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{variant:12} {result['seconds']:7.2f} с  {result['rows'] / result['seconds']:10.0f} строк/с  "
+              f"пик RSS {result['peak_rss_mb']:7.1f} МБ  файл {result['bytes'] / 2 ** 20:6.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
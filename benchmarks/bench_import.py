@@ -0,0 +1,127 @@
+"""Импорт банковской выписки: построчный create_transaction против пакетного import_statement.
+
+Файлы генерируются в формате выписки (дата, сумма со знаком, категория).
+Каждый вариант запускается в отдельном процессе на пустой базе, чтобы ru_maxrss
+не смешивался; «reimport» импортирует тот же CSV дважды и замеряет второй проход,
+где все строки — дубли.
+
+    python -m benchmarks.bench_import --rows 100000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.app import create_app
+from utils.helpers import create_transaction, get_or_create_user
+from utils.importer import _column_map, _parse_row, import_statement, read_rows
+from utils.money import from_minor
+
+CATEGORIES = ["Еда", "Транспорт", "Развлечения", "Супермаркеты", "Кафе", "Аптеки"]
+HEADER = ["Дата операции", "Сумма операции", "Категория", "Описание"]
+
+
+def statement_rows(rows):
+    start = datetime.utcnow() - timedelta(days=3 * 365)
+    for i in range(rows):
+        income = random.random() < 0.05
+        amount = random.randint(100_000, 10_000_000) if income else -random.randint(100, 500_000)
+        category = "Зарплата" if income else random.choice(CATEGORIES)
+        yield start + timedelta(seconds=i * 900), amount, category, f"операция {i}"
+
+
+def generate(directory, rows):
+    csv_path = os.path.join(directory, "statement.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out, delimiter=";")
+        writer.writerow(HEADER)
+        for ts, amount, category, note in statement_rows(rows):
+            writer.writerow([ts.strftime("%d.%m.%Y %H:%M:%S"), f"{from_minor(amount):.2f}".replace(".", ","),
+                             category, note])
+
+    from openpyxl import Workbook
+
+    xlsx_path = os.path.join(directory, "statement.xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(HEADER)
+    for ts, amount, category, note in statement_rows(rows):
+        ws.append([ts, from_minor(amount), category, note])
+    wb.save(xlsx_path)
+    return csv_path, xlsx_path
+
+
+def per_row(user, path, limit):
+    # Так данные попадали в базу раньше: поиск категории и commit на каждую транзакцию.
+    rows = read_rows(open(path, "rb"), path)
+    columns = _column_map(next(rows))
+    done = 0
+    for raw in rows:
+        timestamp, amount, ctype, category = _parse_row(raw, columns)
+        create_transaction(user, from_minor(amount), ctype, category)
+        done += 1
+        if done >= limit:
+            break
+    return done
+
+
+def run_variant(variant, path, limit):
+    db_path = os.path.join(tempfile.mkdtemp(), "import.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"})
+    with app.app_context():
+        user = get_or_create_user(1)
+        if variant == "per-row":
+            started = time.perf_counter()
+            rows = per_row(user, path, limit)
+        else:
+            if variant == "reimport":
+                with open(path, "rb") as stream:
+                    import_statement(user, stream, path)
+            started = time.perf_counter()
+            with open(path, "rb") as stream:
+                result = import_statement(user, stream, path)
+            rows = result.inserted + result.duplicates + result.invalid
+        elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "variant": variant,
+        "rows": rows,
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--per-row-limit", type=int, default=2000,
+                        help="построчный вариант слишком медленный для всего файла")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_variant(args.run, args.file, args.per_row_limit)
+        return
+
+    csv_path, xlsx_path = generate(tempfile.mkdtemp(), args.rows)
+    variants = [("per-row", csv_path), ("csv", csv_path), ("xlsx", xlsx_path), ("reimport", csv_path)]
+    for variant, path in variants:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_import", "--run", variant, "--file", path,
+             "--per-row-limit", str(args.per_row_limit)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{variant:9} {result['rows']:>8} строк  {result['seconds']:7.2f} с  "
+              f"{result['rows'] / result['seconds']:9.0f} строк/с  пик RSS {result['peak_rss_mb']:7.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Задания планировщика на синтетической базе: цикл по пользователям против set-based запросов.
+
+    python -m benchmarks.bench_jobs --users 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.app import create_app
+from utils.database import count_queries
+from utils.helpers import get_category_spent
+from utils.aggregates import totals_by_type
+from utils.models import User
+from utils.money import format_minor, to_minor
+from utils.rollups import rebuild
+from utils.schedule_tasks import check_budgets, send_daily_summary
+
+CATEGORIES = [("Еда", "expense"), ("Транспорт", "expense"), ("Развлечения", "expense"),
+              ("Зарплата", "income"), ("Бонус", "income")]
+
+
+class CountingOutbox:
+    def __init__(self):
+        self.messages = 0
+
+    def enqueue(self, chat_id, text, **kwargs):
+        self.messages += 1
+
+
+def generate(path, users, txns_per_user, budget_share):
+    conn = sqlite3.connect(path)
+    now = datetime.utcnow()
+    conn.executemany("INSERT INTO user (id, telegram_id, currency) VALUES (?, ?, 'RUB')",
+                     ((uid, 10_000_000 + uid) for uid in range(1, users + 1)))
+    conn.executemany("INSERT INTO category (id, user_id, name, type) VALUES (?, ?, ?, ?)",
+                     ((uid * 5 + i, uid, name, ctype)
+                      for uid in range(1, users + 1) for i, (name, ctype) in enumerate(CATEGORIES)))
+
+    def transactions():
+        for uid in range(1, users + 1):
+            for _ in range(txns_per_user):
+                i = random.randrange(3)
+                ts = now - timedelta(hours=random.randint(0, 24 * 20))
+                yield uid, random.randint(1_000, 300_000), "expense", uid * 5 + i, ts.isoformat(" ")
+
+    conn.executemany('INSERT INTO "transaction" (user_id, amount, type, category_id, timestamp) '
+                     'VALUES (?, ?, ?, ?, ?)', transactions())
+    conn.executemany("INSERT INTO budget (user_id, category_id, amount) VALUES (?, ?, ?)",
+                     ((uid, uid * 5, random.choice([500_000, 2_000_000, 10_000_000]))
+                      for uid in range(1, users + 1) if random.random() < budget_share))
+    conn.commit()
+    conn.close()
+
+
+def legacy_daily_summary(outbox, app):
+    with app.app_context():
+        today = datetime.utcnow().date()
+        for user in User.query.all():
+            _, total = totals_by_type(user.id, today)
+            outbox.enqueue(user.telegram_id, format_minor(total))
+
+
+def legacy_check_budgets(outbox, app):
+    with app.app_context():
+        for user in User.query.all():
+            for b in user.budgets:
+                spent = get_category_spent(user, b.category_id)
+                if b.amount > 0 and to_minor(spent) / b.amount >= 0.8:
+                    outbox.enqueue(user.telegram_id, f"{b.category.name}")
+
+
+def run(app, job):
+    outbox = CountingOutbox()
+    with app.app_context(), count_queries() as statements:
+        started = time.perf_counter()
+        job(outbox, app)
+        elapsed = time.perf_counter() - started
+    return elapsed, len(statements), outbox.messages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--txns-per-user", type=int, default=10)
+    parser.add_argument("--budget-share", type=float, default=0.3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    started = time.perf_counter()
+    generate(path, args.users, args.txns_per_user, args.budget_share)
+    with app.app_context():
+        rebuild()
+    print(f"база: {args.users} пользователей за {time.perf_counter() - started:.1f} с ({path})")
+
+    jobs = [("send_daily_summary", legacy_daily_summary, send_daily_summary),
+            ("check_budgets", legacy_check_budgets, check_budgets)]
+    for name, legacy, current in jobs:
+        for label, job in (("цикл", legacy), ("set-based", current)):
+            if label == "цикл" and args.skip_legacy:
+                continue
+            elapsed, queries, messages = run(app, job)
+            print(f"{name:20} {label:10} {elapsed:8.2f} с  запросов {queries:8}  сообщений {messages}")
+
+
+if __name__ == "__main__":
+    main()
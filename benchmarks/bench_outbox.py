@@ -0,0 +1,83 @@
+"""Рассылка через Outbox против «все сразу» на фейковом Bot с лимитами Telegram.
+
+FakeBot отвечает RetryAfter, если за последнюю секунду отправлено больше --limit сообщений,
+и Forbidden для заблокировавших бота пользователей.
+
+    python -m benchmarks.bench_outbox --users 2000 --limit 30 --rate 25
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from telegram.error import Forbidden, RetryAfter
+
+from utils.outbox import Outbox
+
+
+class FakeBot:
+    def __init__(self, limit, latency=0.02, blocked_share=0.01):
+        self.limit = limit
+        self.latency = latency
+        self.blocked_share = blocked_share
+        self.window = deque()
+        self.delivered = 0
+        self.rejected = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        while self.window and now - self.window[0] > 1:
+            self.window.popleft()
+        if len(self.window) >= self.limit:
+            self.rejected += 1
+            raise RetryAfter(1)
+        if chat_id % int(1 / self.blocked_share) == 0:
+            raise Forbidden("bot was blocked by the user")
+        self.window.append(now)
+        self.delivered += 1
+
+
+async def naive(bot, users):
+    results = await asyncio.gather(
+        *(bot.send_message(chat_id=chat_id, text="📊") for chat_id in range(1, users + 1)),
+        return_exceptions=True,
+    )
+    return sum(isinstance(r, RetryAfter) for r in results)
+
+
+async def queued(bot, users, rate, workers):
+    outbox = Outbox(rate=rate, workers=workers)
+    await outbox.start(bot)
+    for chat_id in random.sample(range(1, users + 1), users):
+        outbox.enqueue(chat_id, "📊")
+    await outbox.join()
+    await outbox.stop()
+    return outbox
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--rate", type=float, default=25)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    bot = FakeBot(args.limit)
+    started = time.perf_counter()
+    lost = asyncio.run(naive(bot, args.users))
+    print(f"все сразу: {time.perf_counter() - started:6.1f} с, доставлено {bot.delivered}, "
+          f"потеряно на 429: {lost}")
+
+    bot = FakeBot(args.limit)
+    started = time.perf_counter()
+    outbox = asyncio.run(queued(bot, args.users, args.rate, args.workers))
+    elapsed = time.perf_counter() - started
+    print(f"Outbox:    {elapsed:6.1f} с, доставлено {bot.delivered} ({bot.delivered / elapsed:.1f}/с), "
+          f"ответов 429: {bot.rejected}, повторов: {outbox.retried}, dead letters: {len(outbox.dead_letters)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Задержка обработчиков диалога с персистентностью состояния и без неё.
+
+Каждый пользователь проходит диалог «Добавить расход» → сумма → категория,
+апдейты подаются в Application.process_update, ответы уходят в фейковый
+Telegram API. В конце приложение перезапускается с середины диалога и
+проверяется, что состояние восстановилось из БД.
+
+    python -m benchmarks.bench_persistence --users 200 --interval 1
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from telegram import Update
+
+from benchmarks.fake_telegram import FakeTelegramAPI, text_update
+from bot.application import build_application
+from bot.persistence import SQLitePersistence
+from utils.app import create_app
+from utils.async_db import init_async_db, shutdown_async_db
+
+TOKEN = "123456:TEST"
+DIALOG = ["Добавить расход", "100", "Еда"]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def drive(application, users, steps, offset=0):
+    latencies = []
+    update_id = offset
+    for text in steps:
+        for i in range(users):
+            update_id += 1
+            update = Update.de_json(text_update(update_id, 1000 + i, text), application.bot)
+            started = time.perf_counter()
+            await application.process_update(update)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(api, users, persistence, interval):
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=persistence)
+    if persistence:
+        application.persistence = SQLitePersistence(update_interval=interval)
+    async with application:
+        await application.start()
+        await drive(application, users, ["/start"])
+        started = time.perf_counter()
+        latencies = await drive(application, users, DIALOG, offset=users)
+        elapsed = time.perf_counter() - started
+        await application.stop()
+    stats = application.persistence
+    return latencies, elapsed, stats
+
+
+async def check_restart(api, users):
+    # Первые два шага диалога, остановка, новое приложение, последний шаг.
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=True)
+    async with application:
+        await drive(application, users, DIALOG[:2], offset=10 * users)
+    sent = api.sent
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=True)
+    async with application:
+        await drive(application, users, DIALOG[2:], offset=20 * users)
+        conversations = application.handlers[0][1]._conversations
+    return api.sent - sent, len(conversations)
+
+
+def report(name, latencies, elapsed, persistence=None):
+    line = (
+        f"{name:<16} p50 {statistics.median(latencies) * 1000:6.2f} мс  "
+        f"p95 {percentile(latencies, 95) * 1000:6.2f} мс  "
+        f"{len(latencies) / elapsed:7.1f} апдейтов/с"
+    )
+    if persistence is not None:
+        line += f"  записей в БД: {persistence.writes} ({persistence.rows} строк)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI()
+    for persistence in (False, True):
+        db_path = os.path.join(tempfile.mkdtemp(), "persistence.db")
+        flask_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"})
+        with flask_app.app_context():
+            init_async_db(flask_app)
+            latencies, elapsed, stats = asyncio.run(run(api, args.users, persistence, args.interval))
+            report("с persistence" if persistence else "без persistence", latencies, elapsed,
+                   stats if persistence else None)
+            if persistence:
+                replies, open_conversations = asyncio.run(check_restart(api, args.users))
+                print(f"после перезапуска: ответов {replies}/{args.users}, незавершённых диалогов {open_conversations}")
+            shutdown_async_db()
+    api.close()
+
+
+if __name__ == "__main__":
+    main()
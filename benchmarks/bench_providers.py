@@ -0,0 +1,72 @@
+"""Последовательный fallback против хеджированных запросов к провайдерам курсов.
+
+Основной провайдер медленный и иногда падает, резервный быстрый:
+
+    python -m benchmarks.bench_providers --primary-latency 0.8 --primary-errors 0.2 --fallback-latency 0.1
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.fake_providers import FakeProvider
+from utils.rates import HedgedFetcher, OpenErApiProvider, RateProvider
+
+
+def sequential(primary_url, fallback_url):
+    # Прежний алгоритм /api/rates: новый запрос (и соединение) на каждую попытку.
+    def fetch(base):
+        for url in (f"{primary_url}?base={base}", f"{fallback_url}/{base}"):
+            try:
+                rates = requests.get(url, timeout=5).json().get("rates")
+                if rates:
+                    return {"base": base, "rates": rates}
+            except Exception:
+                pass
+        return {"base": base, "rates": {}}
+    return fetch
+
+
+def measure(fetch, n):
+    samples, failures = [], 0
+    for i in range(n):
+        started = time.perf_counter()
+        failures += not fetch(("RUB", "USD", "EUR")[i % 3])["rates"]
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1], failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--primary-latency", type=float, default=0.8)
+    parser.add_argument("--primary-errors", type=float, default=0.2)
+    parser.add_argument("--fallback-latency", type=float, default=0.1)
+    parser.add_argument("--hedge-delay", type=float, default=0.15)
+    parser.add_argument("--requests", type=int, default=40)
+    args = parser.parse_args()
+
+    primary = FakeProvider(latency=args.primary_latency, error_rate=args.primary_errors)
+    fallback = FakeProvider(latency=args.fallback_latency)
+
+    hedged = HedgedFetcher([
+        RateProvider("primary", primary.url),
+        OpenErApiProvider("fallback", fallback.url),
+    ], hedge_delay=args.hedge_delay)
+
+    for name, fetch in (
+            ("последовательно", sequential(primary.url, fallback.url)),
+            ("хеджирование", hedged),
+    ):
+        median, p95, failures = measure(fetch, args.requests)
+        print(f"{name:18} median {median * 1000:7.1f} мс   p95 {p95 * 1000:7.1f} мс   без курсов: {failures}")
+    for stats in hedged.stats():
+        print("   ", stats)
+
+    primary.close()
+    fallback.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Ввод нескольких операций: диалог «Добавить расход» против быстрого ввода одним сообщением.
+
+Каждый пользователь записывает --entries расходов. Считаются входящие апдейты,
+ответы бота, commit-ы и SQL-запросы, а также общее время.
+
+    python -m benchmarks.bench_quick_entry --users 50 --entries 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import event
+from telegram import Update
+
+from benchmarks.fake_telegram import FakeTelegramAPI, text_update
+from bot.application import build_application
+from utils.app import create_app
+from utils.async_db import init_async_db, shutdown_async_db
+from utils.database import count_queries, db
+from utils.helpers import _category_cache, _user_cache
+from utils.models import Transaction
+
+TOKEN = "123456:TEST"
+CATEGORIES = ["Еда", "Транспорт", "Развлечения"]
+
+
+def conversation(entries):
+    for amount, name in entries:
+        yield from ("Добавить расход", str(amount), name)
+
+
+def quick(entries):
+    yield "\n".join(f"{amount} {name}" for amount, name in entries)
+
+
+async def drive(api, users, entries, messages, commits, statements):
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=False, concurrency=1)
+    plans = {1000 + i: [(random.randint(1, 5000), random.choice(CATEGORIES)) for _ in range(entries)]
+             for i in range(users)}
+    update_id = 0
+    async with application:
+        for user_id in plans:
+            update_id += 1
+            await application.process_update(
+                Update.de_json(text_update(update_id, user_id, "/start"), application.bot))
+        sent, updates = api.sent, 0
+        baseline = len(commits), len(statements)
+        started = time.perf_counter()
+        for user_id, plan in plans.items():
+            for text in messages(plan):
+                update_id += 1
+                updates += 1
+                await application.process_update(
+                    Update.de_json(text_update(update_id, user_id, text), application.bot))
+        elapsed = time.perf_counter() - started
+    return updates, api.sent - sent, len(commits) - baseline[0], len(statements) - baseline[1], elapsed
+
+
+def run(api, args, name, messages):
+    _user_cache.clear()
+    _category_cache.clear()
+    path = os.path.join(tempfile.mkdtemp(), "quick.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    commits = []
+    with app.app_context():
+        init_async_db(app)
+        event.listen(db.engine, "commit", lambda conn: commits.append(1))
+        with count_queries() as statements:
+            updates, replies, commit_count, query_count, elapsed = asyncio.run(
+                drive(api, args.users, args.entries, messages, commits, statements))
+        shutdown_async_db()
+        saved = Transaction.query.count()
+    print(f"{name:<10} апдейтов {updates:6}  ответов {replies:6}  commit {commit_count:6}  "
+          f"SQL {query_count:7}  {elapsed:6.2f} с  сохранено {saved}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--entries", type=int, default=5)
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI()
+    run(api, args, "диалог", conversation)
+    run(api, args, "быстрый", quick)
+    api.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Задержка курсов валют на локальных заглушках провайдеров.
+
+Сравнивает /api/rates с холодным, тёплым и устаревшим кешем, а также путь бота:
+прежний HTTP-запрос к собственному API против прямого вызова rates_service.
+
+    python -m benchmarks.bench_rates --latency 0.3 --requests 200
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.fake_providers import FakeProvider
+from utils.app import create_app
+from utils.rates import HedgedFetcher, OpenErApiProvider, RateProvider, rates_service
+
+
+def timed(call, n):
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(f"{name:32} median {statistics.median(samples) * 1e6:10.0f} мкс   p95 {p95 * 1e6:10.0f} мкс")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    primary = FakeProvider(latency=args.latency)
+    fallback = FakeProvider(latency=args.latency)
+    rates_service.fetch = HedgedFetcher([
+        RateProvider("primary", primary.url),
+        OpenErApiProvider("fallback", fallback.url),
+    ])
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+    client = app.test_client()
+
+    def api_call():
+        resp = client.get("/api/rates?base=USD")
+        assert resp.status_code == 200 and resp.get_json()["rates"], resp.data
+
+    rates_service.ttl = rates_service.stale_ttl = 0
+    report("API без кеша", timed(api_call, min(args.requests, 10)))
+
+    rates_service.ttl, rates_service.stale_ttl = 60, 3600
+    rates_service.refresh_all()
+    report("API, тёплый кеш", timed(api_call, args.requests))
+
+    rates_service.ttl = 0
+    report("API, устаревший кеш (SWR)", timed(api_call, args.requests))
+    rates_service.ttl = 60
+    rates_service.refresh_all()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/rates?base=USD"
+
+    def loopback():
+        assert requests.get(url, timeout=5).json()["rates"]
+
+    report("бот: HTTP-петля к своему API", timed(loopback, args.requests))
+
+    loop = asyncio.new_event_loop()
+    report("бот: rates_service.aquote", timed(lambda: loop.run_until_complete(rates_service.aquote("USD")),
+                                              args.requests))
+    loop.close()
+
+    server.shutdown()
+    primary.close()
+    fallback.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Смешанная нагрузка чтение/запись на SQLite: настройки по умолчанию против профиля из config.
+
+Писатели добавляют расходы через create_transaction, читатели запрашивают баланс
+и расходы по категориям; каждый вызов, как и в run_db, идёт в своём контексте
+приложения. Считаются выполненные операции и ошибки «database is locked».
+
+    python -m benchmarks.bench_sqlite --writers 4 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.bench_async_db import populate
+from utils.app import create_app
+from utils.helpers import (
+    _category_cache,
+    _user_cache,
+    create_transaction,
+    get_balance,
+    get_monthly_expenses_by_category,
+    get_or_create_user,
+)
+from utils.models import CategoryType
+
+PROFILES = {
+    "default": {"SQLITE_PRAGMAS": {}, "SQLALCHEMY_ENGINE_OPTIONS": {}},
+    "tuned": {},
+}
+
+
+def write(tg_id):
+    user = get_or_create_user(tg_id)
+    create_transaction(user, round(random.uniform(10, 500), 2), CategoryType.expense, "Еда")
+
+
+def read(tg_id):
+    user = get_or_create_user(tg_id)
+    get_balance(user)
+    get_monthly_expenses_by_category(user)
+
+
+def worker(app, op, users, deadline, counts, latencies):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                op(random.randint(1, users))
+        except OperationalError as exc:
+            counts["locked" if "locked" in str(exc) else "error"] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        counts[op.__name__] += 1
+
+
+def run(profile, args):
+    _user_cache.clear()
+    _category_cache.clear()
+    path = os.path.join(tempfile.mkdtemp(), "sqlite.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", **PROFILES[profile]})
+    populate(app, args.users, args.rows)
+
+    counts, latencies = Counter(), []
+    deadline = time.monotonic() + args.seconds
+    threads = [
+        threading.Thread(target=worker, args=(app, op, args.users, deadline, counts, latencies))
+        for op in [write] * args.writers + [read] * args.readers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    print(
+        f"{profile:<8} запись {counts['write'] / args.seconds:8.1f}/с  "
+        f"чтение {counts['read'] / args.seconds:8.1f}/с  "
+        f"p99 {p99 * 1000:7.1f} мс  locked {counts['locked']}  прочие ошибки {counts['error']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    for profile in PROFILES:
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
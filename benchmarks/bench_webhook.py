@@ -0,0 +1,119 @@
+"""Пропускная способность webhook-режима в зависимости от числа воркеров.
+
+Поднимает фейковый Telegram API, запускает run_webhook с N воркерами и отправляет
+на webhook поток апдейтов «Показать баланс» от разных пользователей; пропускная
+способность считается по ответам, дошедшим до фейкового API. Затем часть пользователей
+запрашивает «Диаграммы», и проверяется, что графики из воркеров дошли до API.
+
+    python -m benchmarks.bench_webhook --workers 1,2,4 --users 200 --updates 2000
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_telegram import FakeTelegramAPI, text_update
+from bot.webhook import WebhookOptions, run_webhook
+
+TOKEN = "123456:TEST"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run(workers, users, updates, api_latency):
+    api = FakeTelegramAPI(latency=api_latency)
+    db_path = os.path.join(tempfile.mkdtemp(), "webhook.db")
+    options = WebhookOptions(
+        workers=workers,
+        token=TOKEN,
+        base_url=f"{api.url}/bot",
+        url="",
+        secret="",
+        listen="127.0.0.1",
+        port=free_port(),
+        api_port=free_port(),
+        scheduler=False,
+        flask_config={"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"},
+    )
+    front = multiprocessing.get_context("spawn").Process(target=run_webhook, args=(options,), daemon=False)
+    front.start()
+    url = f"http://127.0.0.1:{options.port}{options.path}"
+    session = requests.Session()
+
+    def post(update):
+        session.post(url, json=update, timeout=10)
+
+    try:
+        wait_until(lambda: _listening(options.port), 30)
+        # Прогрев: /start и один расход на пользователя создают записи в БД.
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(post, (text_update(i, 1000 + i, "/start") for i in range(users))))
+        wait_until(lambda: api.sent >= users, 120)
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(post, (text_update(users + i, 1000 + i, "100 Еда") for i in range(users))))
+        wait_until(lambda: api.sent >= 2 * users, 120)
+
+        api.sent, api.first_at = 0, None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(post, (
+                text_update(2 * users + i, 1000 + i % users, "Показать баланс") for i in range(updates)
+            )))
+        done = wait_until(lambda: api.sent >= updates, 300)
+        elapsed = time.perf_counter() - started
+        throughput = api.sent / elapsed
+
+        # Графики рендерятся в пуле процессов внутри воркера: проверяем, что он там запускается.
+        chart_users = min(users, workers * 4)
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(post, (
+                text_update(2 * users + updates + i, 1000 + i, "Диаграммы") for i in range(chart_users)
+            )))
+        charts = wait_until(lambda: api.photos >= 2 * chart_users, 120)
+        return throughput, done, charts
+    finally:
+        front.terminate()
+        front.join(10)
+        api.close()
+
+
+def _listening(port):
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        throughput, complete, charts = run(workers, args.users, args.updates, args.api_latency)
+        note = "" if complete else " (не все ответы получены)"
+        note += "" if charts else " (графики не получены)"
+        print(f"воркеров {workers}: {throughput:8.1f} апдейтов/с{note}")
+
+
+if __name__ == "__main__":
+    main()
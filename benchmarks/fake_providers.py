@@ -0,0 +1,61 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RATES = {"RUB": 1.0, "USD": 0.0108, "EUR": 0.0099}
+
+
+def _rates_for(base):
+    scale = RATES.get(base, 1.0)
+    return {cur: round(value / scale, 6) for cur, value in RATES.items()}
+
+
+class FakeProvider:
+    """Локальная замена exchangerate.host / open.er-api.com с управляемой задержкой и ошибками.
+
+    Отвечает на ``/latest?base=XXX`` (формат exchangerate.host) и ``/latest/XXX``
+    (формат open.er-api.com).
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                provider.requests += 1
+                time.sleep(provider.latency + random.uniform(0, provider.jitter))
+                if random.random() < provider.error_rate:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                url = urlparse(self.path)
+                base = parse_qs(url.query).get("base", [url.path.rsplit("/", 1)[-1]])[0].upper()
+                body = json.dumps({
+                    "base": base,
+                    "date": "2026-01-01",
+                    "time_last_update_utc": "Thu, 01 Jan 2026 00:00:01 +0000",
+                    "rates": _rates_for(base),
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/latest"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "finhelper", "username": "finhelper_bot"}
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 512
+
+
+class FakeTelegramAPI:
+    """Локальная замена api.telegram.org: отвечает на getMe/setWebhook/send* и считает исходящие сообщения.
+
+    Используется как ``base_url`` приложения: ``f"{api.url}/bot"``.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = 0
+        self.photos = 0
+        self.first_at = None
+        self.last_at = None
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                method = self.path.rsplit("/", 1)[-1]
+                content_type = self.headers.get("Content-Type", "")
+                # multipart (отправка файлов) не разбирается: для счётчика параметры не нужны.
+                if content_type.startswith("application/json"):
+                    params = json.loads(raw)
+                elif content_type.startswith("application/x-www-form-urlencoded"):
+                    params = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+                else:
+                    params = {}
+                time.sleep(api.latency)
+                self._reply(api.handle(method, params))
+
+            do_GET = do_POST
+
+            def _reply(self, result):
+                body = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handle(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method.startswith("send"):
+            now = time.perf_counter()
+            with self._lock:
+                self.sent += 1
+                self.photos += method == "sendPhoto"
+                self.first_at = self.first_at or now
+                self.last_at = now
+            chat_id = int(params.get("chat_id", 0) or 0)
+            return {
+                "message_id": self.sent,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        return True
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def text_update(update_id, user_id, text):
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        # CommandHandler срабатывает только при наличии сущности bot_command.
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
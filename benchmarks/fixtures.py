@@ -0,0 +1,146 @@
+"""Синтетическая база в схеме finhelper.db для бенчмарков.
+
+Схема и миграции создаются приложением, данные вставляются напрямую через sqlite3,
+после чего дневная сводка пересчитывается utils.rollups.rebuild. Генерация
+детерминирована по --seed: одни и те же параметры дают одну и ту же базу
+(даты отсчитываются от дня генерации).
+
+    python -m benchmarks.fixtures finhelper-bench.db --users 1000 --categories 10 \
+        --txns-per-user 500 --budget-share 0.3 --days 365
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+from utils.app import create_app
+from utils.database import db
+from utils.rollups import rebuild
+
+TELEGRAM_ID_OFFSET = 10_000_000
+# Те же категории, что создаёт get_or_create_user, чтобы сценарии бота находили «Еда» и «Транспорт».
+DEFAULT_CATEGORIES = [("Еда", "expense"), ("Транспорт", "expense"), ("Развлечения", "expense"),
+                      ("Зарплата", "income"), ("Бонус", "income")]
+EXTRA_CATEGORIES = ["Кафе", "Супермаркеты", "Аптеки", "Одежда", "Связь", "Коммуналка", "Подарки",
+                    "Спорт", "Путешествия", "Образование", "Дом", "Животные"]
+CURRENCIES = ["RUB"] * 8 + ["USD", "EUR"]
+
+
+@dataclass
+class FixtureSpec:
+    users: int = 1000
+    categories: int = 10
+    txns_per_user: int = 500
+    budget_share: float = 0.3
+    days: int = 365
+    income_share: float = 0.05
+    seed: int = 42
+
+
+def telegram_id(user_id: int) -> int:
+    return TELEGRAM_ID_OFFSET + user_id
+
+
+def _category_names(count: int):
+    names = list(DEFAULT_CATEGORIES)
+    for i in range(max(0, count - len(names))):
+        name = EXTRA_CATEGORIES[i] if i < len(EXTRA_CATEGORIES) else f"Категория {i + 1}"
+        names.append((name, "expense"))
+    return names[:max(count, 1)]
+
+
+def _insert(path: str, spec: FixtureSpec) -> int:
+    rng = random.Random(spec.seed)
+    names = _category_names(spec.categories)
+    per_user = len(names)
+    now = datetime.utcnow().replace(microsecond=0)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO user (id, telegram_id, currency) VALUES (?, ?, ?)",
+                     ((uid, telegram_id(uid), rng.choice(CURRENCIES)) for uid in range(1, spec.users + 1)))
+    conn.executemany("INSERT INTO category (id, user_id, name, type) VALUES (?, ?, ?, ?)",
+                     ((uid * per_user + i, uid, name, ctype)
+                      for uid in range(1, spec.users + 1) for i, (name, ctype) in enumerate(names)))
+
+    expense = [i for i, (_, ctype) in enumerate(names) if ctype == "expense"]
+    income = [i for i, (_, ctype) in enumerate(names) if ctype == "income"]
+    # Первые категории тратятся чаще, как «Еда» и «Транспорт» у живых пользователей.
+    weights = [1 / (rank + 1) for rank in range(len(expense))]
+    horizon = spec.days * 86400
+
+    def transactions():
+        for uid in range(1, spec.users + 1):
+            offsets = sorted(rng.randrange(horizon) for _ in range(spec.txns_per_user))
+            for offset in reversed(offsets):
+                ts = (now - timedelta(seconds=offset)).isoformat(" ")
+                if income and rng.random() < spec.income_share:
+                    yield uid, rng.randint(1_000_000, 20_000_000), "income", uid * per_user + rng.choice(income), ts
+                else:
+                    # Логнормальное распределение: много мелких покупок и редкие крупные.
+                    amount = min(int(rng.lognormvariate(10, 1.2)), 5_000_000) + 100
+                    cid = uid * per_user + rng.choices(expense, weights)[0]
+                    yield uid, amount, "expense", cid, ts
+
+    conn.executemany('INSERT INTO "transaction" (user_id, amount, type, category_id, timestamp) '
+                     'VALUES (?, ?, ?, ?, ?)', transactions())
+
+    def budgets():
+        for uid in range(1, spec.users + 1):
+            if rng.random() >= spec.budget_share:
+                continue
+            for i in rng.sample(expense, min(len(expense), rng.randint(1, 3))):
+                yield uid, uid * per_user + i, rng.choice([500_000, 2_000_000, 5_000_000, 10_000_000])
+
+    conn.executemany("INSERT INTO budget (user_id, category_id, amount) VALUES (?, ?, ?)", budgets())
+    conn.commit()
+    count = conn.execute('SELECT COUNT(*) FROM "transaction"').fetchone()[0]
+    conn.close()
+    return count
+
+
+def generate(path: str, spec: FixtureSpec) -> dict:
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    started = time.perf_counter()
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(path)}"})
+    transactions = _insert(path, spec)
+    with app.app_context():
+        rebuild()
+        db.engine.dispose()
+    # Копия базы должна быть самодостаточной, без хвоста в -wal.
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return {**asdict(spec), "transactions": transactions, "seconds": time.perf_counter() - started}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FixtureSpec()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--categories", type=int, default=defaults.categories)
+    parser.add_argument("--txns-per-user", type=int, default=defaults.txns_per_user)
+    parser.add_argument("--budget-share", type=float, default=defaults.budget_share)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--income-share", type=float, default=defaults.income_share)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def spec_from_args(args) -> FixtureSpec:
+    return FixtureSpec(args.users, args.categories, args.txns_per_user, args.budget_share,
+                       args.days, args.income_share, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    add_arguments(parser)
+    args = parser.parse_args()
+    info = generate(args.path, spec_from_args(args))
+    print(f"{args.path}: {info['users']} пользователей, {info['transactions']} транзакций "
+          f"за {info['seconds']:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Отчёт о времени импорта точки входа бота и проверка бюджета холодного старта.
+
+Запускает ``python -X importtime -c "import app"`` в чистом процессе, группирует время
+по пакетам верхнего уровня и завершается с кодом 1, если суммарное время превышает
+STARTUP_IMPORT_BUDGET_MS или при старте загружен модуль из STARTUP_DEFERRED_MODULES.
+
+    python -m benchmarks.importtime [--budget-ms 1000] [--module app] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from config import STARTUP_DEFERRED_MODULES, STARTUP_IMPORT_BUDGET_MS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2].strip()
+        rows.append((name, self_us, cumulative_us))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    total_ms = sum(by_package.values()) / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} мс (бюджет {args.budget_ms:.0f} мс)")
+    for package, us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"    {package:30} {us / 1000:8.1f} мс  {us / 10 / total_ms:5.1f}%")
+
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    eager = sorted(loaded & set(STARTUP_DEFERRED_MODULES))
+    if eager:
+        print(f"при старте загружены отложенные модули: {', '.join(eager)}")
+    if total_ms > args.budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Сводный прогон производительности с JSON-отчётом для сравнения между коммитами.
+
+База генерируется benchmarks.fixtures (или берётся готовая через --fixture, например
+копия finhelper.db). Каждая группа сценариев запускается в отдельном процессе на своей
+копии базы, чтобы пик RSS, кеши и записи одной группы не влияли на другие:
+
+- bot — сценарии пользователя: апдейты проходят через Application, handlers и
+  bot.commands, ответы уходят в FakeTelegramAPI; шаг — одно действие из нескольких апдейтов;
+- load — те же пользователи одновременно через update_queue с UPDATE_CONCURRENCY;
+- helpers — прямые вызовы utils.helpers;
+- jobs — задания планировщика;
+- api — /api/rates с заглушкой провайдера курсов (холодный и тёплый кеш).
+
+Для каждого случая в отчёт попадают перцентили задержки, пропускная способность и
+число SQL-запросов на операцию, для группы — пиковый RSS процесса.
+
+    python -m benchmarks.suite --users 1000 --txns-per-user 500 --out base.json
+    python -m benchmarks.suite --users 1000 --txns-per-user 500 --out new.json --compare base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.bench_persistence import percentile
+from benchmarks.fixtures import add_arguments, generate, spec_from_args
+
+TOKEN = "123456:TEST"
+GROUPS = ["bot", "load", "helpers", "jobs", "api"]
+SCRIPT = [
+    ("balance", ["Показать баланс"]),
+    ("add_expense", ["Добавить расход", "250", "Еда"]),
+    ("quick_entry", ["120 Еда\n80 Транспорт\n45.50 Кафе"]),
+    ("stats_today", ["Статистика", "За день"]),
+    ("stats_month", ["Статистика", "За месяц"]),
+    ("stats_period", ["Статистика", "По категориям", "90"]),
+    ("export_csv", ["Экспорт в CSV"]),
+    ("export_xlsx", ["Экспорт в XLSX"]),
+    ("charts", ["Диаграммы"]),
+    ("rates", ["Курс валют"]),
+]
+LOAD_STEPS = ["Показать баланс", "300 Еда", "Статистика", "За месяц"]
+# Параметры, которые родительский процесс передаёт процессам групп.
+FORWARDED = ["sample_users", "iterations", "api_requests", "api_latency", "rates_latency"]
+
+
+def summarize(samples, queries=0, elapsed=None):
+    samples = sorted(samples)
+    n = len(samples)
+    total = elapsed if elapsed is not None else sum(samples)
+    return {
+        "n": n,
+        "p50_ms": percentile(samples, 50) * 1000 if n else None,
+        "p90_ms": percentile(samples, 90) * 1000 if n else None,
+        "p99_ms": percentile(samples, 99) * 1000 if n else None,
+        "mean_ms": sum(samples) / n * 1000 if n else None,
+        "max_ms": samples[-1] * 1000 if n else None,
+        "ops_per_s": n / total if total else None,
+        "queries_per_op": queries / n if n else None,
+    }
+
+
+def measure(calls):
+    from utils.database import count_queries
+
+    samples = []
+    with count_queries() as statements:
+        for func, args in calls:
+            started = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples, len(statements))
+
+
+def sample_users(count):
+    from utils.database import db
+    from utils.models import User
+
+    ids = db.session.scalars(db.select(User.telegram_id).order_by(User.id).limit(count + 1)).all()
+    if not ids:
+        raise SystemExit("В базе нет пользователей")
+    # Первый пользователь только прогревает кеши, пул графиков и соединения.
+    return ids[0], ids[1:] or ids[:1]
+
+
+def stub_rates(latency):
+    from benchmarks.fake_providers import FakeProvider
+    from utils.rates import HedgedFetcher, RateProvider, rates_service
+
+    provider = FakeProvider(latency=latency)
+    rates_service.fetch = HedgedFetcher([RateProvider("stub", provider.url)])
+    rates_service._entries.clear()
+    return provider
+
+
+async def _run_script(application, user_id, update_id, statements=None, results=None):
+    from telegram import Update
+
+    from benchmarks.fake_telegram import text_update
+
+    for name, texts in SCRIPT:
+        before = len(statements) if statements is not None else 0
+        started = time.perf_counter()
+        for text in texts:
+            update_id += 1
+            await application.process_update(Update.de_json(text_update(update_id, user_id, text), application.bot))
+        if results is not None:
+            results[name][0].append(time.perf_counter() - started)
+            results[name][1] += len(statements) - before
+    return update_id
+
+
+async def _bot(api, warmup, users):
+    from bot.application import build_application
+    from utils.database import count_queries
+
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=False, concurrency=1)
+    results = {name: [[], 0] for name, _ in SCRIPT}
+    async with application:
+        update_id = await _run_script(application, warmup, 0)
+        with count_queries() as statements:
+            for user_id in users:
+                update_id = await _run_script(application, user_id, update_id, statements, results)
+    return {name: summarize(samples, queries) for name, (samples, queries) in results.items()}
+
+
+async def _load(api, warmup, users):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    from benchmarks.fake_telegram import text_update
+    from bot.application import build_application
+    from config import UPDATE_CONCURRENCY
+    from utils.database import count_queries
+
+    application = build_application(TOKEN, f"{api.url}/bot", polling=False, persistence=False,
+                                    concurrency=UPDATE_CONCURRENCY)
+    queued, done = {}, {}
+
+    async def record(update, context):
+        done[update.update_id] = time.perf_counter()
+
+    application.add_handler(TypeHandler(Update, record), group=1)
+    async with application:
+        await application.start()
+        update_id = await _run_script(application, warmup, 0)
+        with count_queries() as statements:
+            started = time.perf_counter()
+            for text in LOAD_STEPS:
+                for user_id in users:
+                    update_id += 1
+                    queued[update_id] = time.perf_counter()
+                    await application.update_queue.put(
+                        Update.de_json(text_update(update_id, user_id, text), application.bot))
+            await application.update_queue.join()
+            elapsed = time.perf_counter() - started
+        await application.stop()
+    latencies = [done[uid] - queued[uid] for uid in queued]
+    return {f"updates_x{UPDATE_CONCURRENCY}": summarize(latencies, len(statements), elapsed)}
+
+
+def run_bot(app, args, concurrent=False):
+    from benchmarks.fake_telegram import FakeTelegramAPI
+    from utils.async_db import init_async_db, shutdown_async_db
+
+    api = FakeTelegramAPI(latency=args.api_latency)
+    provider = stub_rates(args.rates_latency)
+    try:
+        with app.app_context():
+            warmup, users = sample_users(args.sample_users)
+            init_async_db(app)
+            try:
+                return asyncio.run((_load if concurrent else _bot)(api, warmup, users))
+            finally:
+                shutdown_async_db()
+    finally:
+        api.close()
+        provider.close()
+
+
+def run_helpers(app, args):
+    from utils.analytics import parse_period
+    from utils.helpers import (
+        create_transaction,
+        export_transactions_csv,
+        export_transactions_excel,
+        get_balance,
+        get_balance_trend,
+        get_daily_expenses,
+        get_monthly_expenses_by_category,
+        get_or_create_user,
+        get_period_report,
+    )
+    from utils.models import CategoryType
+
+    def export(func, user):
+        func(user).close()
+
+    period = parse_period("90")
+    cases = {
+        "get_balance": (get_balance,),
+        "get_daily_expenses": (get_daily_expenses,),
+        "get_monthly_expenses_by_category": (get_monthly_expenses_by_category,),
+        "get_balance_trend": (get_balance_trend,),
+        "get_period_report_90d": (lambda user: get_period_report(user, *period),),
+        "export_transactions_csv": (lambda user: export(export_transactions_csv, user),),
+        "export_transactions_excel": (lambda user: export(export_transactions_excel, user),),
+        "create_transaction": (lambda user: create_transaction(user, 150.0, CategoryType.expense, "Еда"),),
+    }
+    with app.app_context():
+        warmup, telegram_ids = sample_users(args.sample_users)
+        users = [get_or_create_user(tg) for tg in [warmup] + telegram_ids]
+        for (func,) in cases.values():
+            func(users[0])
+        return {name: measure([(func, (user,)) for user in users[1:]]) for name, (func,) in cases.items()}
+
+
+def run_jobs(app, args):
+    from benchmarks.bench_jobs import CountingOutbox
+    from utils.schedule_tasks import check_budgets, send_daily_summary
+
+    results = {}
+    for name, job in (("send_daily_summary", send_daily_summary), ("check_budgets", check_budgets)):
+        outbox = CountingOutbox()
+        with app.app_context():
+            results[name] = measure([(job, (outbox, app))] * args.iterations)
+        results[name]["messages"] = outbox.messages
+    return results
+
+
+def run_api(app, args):
+    from utils.rates import rates_service
+
+    provider = stub_rates(args.rates_latency)
+    client = app.test_client()
+
+    def get(cold):
+        if cold:
+            rates_service._entries.clear()
+        response = client.get("/api/rates?base=RUB&symbols=USD,EUR")
+        assert response.status_code == 200
+
+    try:
+        with app.app_context():
+            get(True)
+            return {
+                "api_rates_cold": measure([(get, (True,))] * args.api_requests),
+                "api_rates_warm": measure([(get, (False,))] * args.api_requests),
+            }
+    finally:
+        provider.close()
+
+
+RUNNERS = {
+    "bot": run_bot,
+    "load": lambda app, args: run_bot(app, args, concurrent=True),
+    "helpers": run_helpers,
+    "jobs": run_jobs,
+    "api": run_api,
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss на Linux наследуется через fork/exec от родителя, который генерировал
+    # фикстуру; VmHWM считается для адресного пространства самого процесса.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_group(group, args):
+    from utils.app import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{args.db}"})
+    started = time.perf_counter()
+    cases = RUNNERS[group](app, args)
+    print(json.dumps({
+        "seconds": time.perf_counter() - started,
+        "peak_rss_mb": peak_rss_mb(),
+        "cases": cases,
+    }))
+
+
+def _git(*command):
+    try:
+        return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    print(f"\nсравнение с {baseline['meta'].get('commit')} (порог {threshold:.0%}):")
+    for group, result in report["groups"].items():
+        base_cases = baseline.get("groups", {}).get(group, {}).get("cases", {})
+        for name, case in result["cases"].items():
+            base = base_cases.get(name)
+            if not base or not base.get("p50_ms") or not case.get("p50_ms"):
+                continue
+            change = case["p50_ms"] / base["p50_ms"] - 1
+            queries = (case["queries_per_op"] or 0) - (base["queries_per_op"] or 0)
+            flag = "  <-- медленнее" if change > threshold else ""
+            if queries > 0.01:
+                flag += f"  <-- +{queries:.1f} SQL/оп"
+            print(f"  {group:8} {name:34} p50 {base['p50_ms']:9.2f} -> {case['p50_ms']:9.2f} мс "
+                  f"({change:+6.1%}){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument("--fixture", help="готовая база вместо генерации (не изменяется)")
+    parser.add_argument("--groups", default=",".join(GROUPS))
+    parser.add_argument("--sample-users", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=3, help="повторы заданий планировщика")
+    parser.add_argument("--api-requests", type=int, default=200)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка FakeTelegramAPI, с")
+    parser.add_argument("--rates-latency", type=float, default=0.05, help="задержка заглушки курсов, с")
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--compare", help="отчёт предыдущего прогона")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--run", choices=GROUPS, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_group(args.run, args)
+        return
+
+    workdir = tempfile.mkdtemp()
+    if args.fixture:
+        fixture, info = args.fixture, {"path": os.path.abspath(args.fixture)}
+    else:
+        fixture = os.path.join(workdir, "fixture.db")
+        info = generate(fixture, spec_from_args(args))
+        print(f"фикстура: {info['users']} пользователей, {info['transactions']} транзакций "
+              f"за {info['seconds']:.1f} с")
+
+    report = {
+        "meta": {
+            "commit": _git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixture": info,
+            "options": {name: getattr(args, name) for name in FORWARDED},
+        },
+        "groups": {},
+    }
+    for group in args.groups.split(","):
+        db_path = os.path.join(workdir, f"{group}.db")
+        shutil.copyfile(fixture, db_path)
+        command = [sys.executable, "-m", "benchmarks.suite", "--run", group, "--db", db_path]
+        for name in FORWARDED:
+            command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        out = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        result = report["groups"][group] = json.loads(out.strip().splitlines()[-1])
+        print(f"{group}: {result['seconds']:.1f} с, пик RSS {result['peak_rss_mb']:.1f} МБ")
+        for name, case in result["cases"].items():
+            print(f"  {name:34} p50 {case['p50_ms']:9.2f} мс  p99 {case['p99_ms']:9.2f} мс  "
+                  f"{case['ops_per_s']:9.1f} оп/с  SQL/оп {case['queries_per_op']:6.1f}")
+
+    with open(args.out, "w", encoding="utf-8") as out:
+        json.dump(report, out, ensure_ascii=False, indent=2)
+    print(f"отчёт: {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
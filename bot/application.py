@@ -0,0 +1,46 @@
+from typing import Optional
+
+from telegram.ext import Application, ApplicationBuilder
+
+from config import BOT_TOKEN, PERSISTENCE_ENABLED, UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+from bot.handlers import register_handlers
+from bot.persistence import SQLitePersistence
+from bot.request import InstrumentedRequest
+from bot.update_processor import BoundedUpdateQueue, PerUserUpdateProcessor
+from utils.outbox import outbox
+from utils.viz import chart_renderer
+
+
+async def _post_init(application: Application):
+    await outbox.start(application.bot)
+
+
+async def _post_shutdown(application: Application):
+    await outbox.stop(drain=False)
+    chart_renderer.shutdown()
+
+
+def build_application(token: str = BOT_TOKEN, base_url: Optional[str] = None,
+                      polling: bool = True, persistence: bool = PERSISTENCE_ENABLED,
+                      concurrency: int = UPDATE_CONCURRENCY,
+                      max_pending: int = UPDATE_MAX_PENDING) -> Application:
+    builder = (
+        ApplicationBuilder()
+        .token(token)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if concurrency > 1:
+        processor = PerUserUpdateProcessor(concurrency, max_pending)
+        builder = builder.concurrent_updates(processor)
+        builder = builder.update_queue(BoundedUpdateQueue(processor.max_concurrent_updates))
+    if persistence:
+        builder = builder.persistence(SQLitePersistence())
+    if not polling:
+        builder = builder.updater(None)
+    app = builder.build()
+    register_handlers(app)
+    return app
@@ -1,24 +1,39 @@
-from datetime import datetime
-import requests
+import asyncio
+import tempfile
+from datetime import timedelta
 
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes, ConversationHandler
 
-from config import LOCAL_API_URL
-from utils.database import db
-from utils.models import Category, Transaction, CategoryType
+from utils.async_db import run_db
+from utils.rates import rates_service
+from utils.models import CategoryType
+from utils.money import format_minor
 from utils.helpers import (
     get_or_create_user,
+    get_categories,
+    add_category,
+    delete_category,
+    set_user_currency,
     create_transaction,
     get_balance,
+    get_daily_expenses,
     export_transactions_csv,
     export_transactions_excel,
+    CSV_FILENAME,
+    XLSX_FILENAME,
     get_monthly_expenses_by_category,
     get_balance_trend,
+    get_period_report,
+    parse_quick_entries,
+    create_transactions,
 )
-from utils.viz import plot_monthly_category_bar, plot_balance_trend
-from bot.keyboards import MAIN_MENU, STATS_MENU, SETTINGS_MENU, CURRENCY_MENU, CATEGORY_MENU
+from utils.analytics import parse_period
+from utils.importer import import_statement
+from config import EXPORT_SPOOL_MAX_SIZE, IMPORT_MAX_FILE_SIZE
+from utils.viz import chart_renderer
+from bot.keyboards import MAIN_MENU, STATS_MENU, SETTINGS_MENU, CURRENCY_MENU, CATEGORY_MENU, CANCEL_MENU, category_keyboard
 
 (
     STATE_AMOUNT,
@@ -32,11 +47,12 @@ from bot.keyboards import MAIN_MENU, STATS_MENU, SETTINGS_MENU, CURRENCY_MENU, C
     STATE_DELETE_CONFIRM,
     STATE_BUDGET_CAT,
     STATE_BUDGET_AMOUNT,
-) = range(11)
+    STATE_STATS_PERIOD,
+) = range(12)
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    get_or_create_user(update.effective_user.id)
+    await run_db(get_or_create_user, update.effective_user.id)
     await update.message.reply_text(
         "👋 Привет! Я — твой финансовый помощник. Выбери действие:",
         reply_markup=MAIN_MENU
@@ -44,7 +60,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def add_transaction_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    get_or_create_user(update.effective_user.id)
+    await run_db(get_or_create_user, update.effective_user.id)
     txn_type = CategoryType.expense if update.message.text == 'Добавить расход' else CategoryType.income
     context.user_data['txn_type'] = txn_type
     prompt = '💸 Введите сумму расхода:' if txn_type == CategoryType.expense else '💰 Введите сумму дохода:'
@@ -59,24 +75,29 @@ async def amount_received(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('⚠️ Введите число.')
         return STATE_AMOUNT
     context.user_data['amount'] = amount
-    user = get_or_create_user(update.effective_user.id)
+    user = await run_db(get_or_create_user, update.effective_user.id)
     txn_type = context.user_data['txn_type']
-    cats = Category.query.filter_by(user_id=user.id, type=txn_type).all()
-    keyboard = [[c.name] for c in cats] + [['Отмена']]
+    cats = await run_db(get_categories, user, txn_type)
     await update.message.reply_text('🗂 Выберите категорию:',
-                                    reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
+                                    reply_markup=category_keyboard(tuple(c.name for c in cats)))
     return STATE_CATEGORY
 
 
+async def amount_invalid(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text('⚠️ Введите число или нажмите «Отмена».',
+                                    reply_markup=CANCEL_MENU)
+    return STATE_AMOUNT
+
+
 async def category_received(update: Update, context: ContextTypes.DEFAULT_TYPE):
     choice = update.message.text
     if choice == 'Отмена':
         await update.message.reply_text('❌ Отменено.', reply_markup=MAIN_MENU)
         return ConversationHandler.END
-    user = get_or_create_user(update.effective_user.id)
+    user = await run_db(get_or_create_user, update.effective_user.id)
     amount = context.user_data['amount']
     txn_type = context.user_data['txn_type']
-    transaction = create_transaction(user, amount, txn_type, choice)
+    transaction = await run_db(create_transaction, user, amount, txn_type, choice)
     if transaction:
         kind = 'расход' if txn_type == CategoryType.expense else 'доход'
         msg = f"✅ {kind.title()} {amount:.2f} {user.currency} в категории «{choice}» сохранён."
@@ -86,9 +107,39 @@ async def category_received(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+QUICK_ENTRY_HELP = (
+    '✍️ Быстрый ввод: по одной операции в строке, сумма и категория.\n'
+    'Например:\n/add 500 Еда\n120 Транспорт'
+)
+
+
+async def quick_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    if text.startswith('/'):
+        parts = text.split(maxsplit=1)
+        text = parts[1] if len(parts) > 1 else ''
+    entries, invalid = parse_quick_entries(text)
+    if not entries:
+        await update.message.reply_text(QUICK_ENTRY_HELP, reply_markup=MAIN_MENU)
+        return
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    saved, unknown, ambiguous = await run_db(create_transactions, user, entries)
+    lines = []
+    if saved:
+        lines.append(f'✅ Сохранено операций: {len(saved)}')
+        lines += [f'• {format_minor(amount)} {user.currency} — {cat.name}' for amount, cat in saved]
+    if unknown:
+        lines.append('⚠️ Нет категорий: ' + ', '.join(unknown))
+    if ambiguous:
+        lines.append('⚠️ Несколько категорий с таким именем в разном регистре: ' + ', '.join(ambiguous))
+    if invalid:
+        lines.append('⚠️ Не распознаны строки: ' + '; '.join(invalid))
+    await update.message.reply_text('\n'.join(lines), reply_markup=MAIN_MENU)
+
+
 async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    balance, inc, exp = get_balance(user)
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    balance, inc, exp = await run_db(get_balance, user)
     text = (
         f"📊 <b>Баланс</b>: {balance:.2f} {user.currency}\n"
         f"💵 Доходы: {inc:.2f} {user.currency}\n"
@@ -103,68 +154,138 @@ async def stats_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def stats_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    total = db.session.query(db.func.sum(Transaction.amount)).filter_by(user_id=user.id,
-                                                                        type=CategoryType.expense).filter(
-        Transaction.timestamp >= start).scalar() or 0
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    total, data = await run_db(get_daily_expenses, user)
     await update.message.reply_text(f'📅 Расходы за сегодня: {total:.2f} {user.currency}', reply_markup=MAIN_MENU)
-    data = {
-        c.name: db.session.query(db.func.sum(Transaction.amount)).filter_by(user_id=user.id, type=CategoryType.expense,
-                                                                            category_id=c.id).filter(
-            Transaction.timestamp >= start).scalar() or 0 for c in
-        Category.query.filter_by(user_id=user.id, type=CategoryType.expense)}
     if any(data.values()):
-        buf = plot_monthly_category_bar(data)
+        buf = await chart_renderer.render('category_bar', user.id, data)
         await update.message.reply_photo(buf, caption='📊 По категориям сегодня', reply_markup=MAIN_MENU)
     return ConversationHandler.END
 
 
 async def stats_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    trend = get_balance_trend(user, days=7)
-    buf = plot_balance_trend(trend)
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    trend = await run_db(get_balance_trend, user, days=7)
+    buf = await chart_renderer.render('balance_trend', user.id, trend)
     await update.message.reply_photo(buf, caption='📈 Баланс за 7 дней', reply_markup=MAIN_MENU)
     return ConversationHandler.END
 
 
 async def stats_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    data = get_monthly_expenses_by_category(user)
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    data = await run_db(get_monthly_expenses_by_category, user)
     total = sum(data.values())
     await update.message.reply_text(f'📆 Расходы за месяц: {total:.2f} {user.currency}', reply_markup=MAIN_MENU)
     if any(data.values()):
-        buf = plot_monthly_category_bar(data)
+        buf = await chart_renderer.render('category_bar', user.id, data)
         await update.message.reply_photo(buf, caption='📊 По категориям за месяц', reply_markup=MAIN_MENU)
     return ConversationHandler.END
 
 
+async def stats_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        '🗓 Введите период: число дней (например, 90) или даты «01.09.2026-30.09.2026».',
+        reply_markup=ReplyKeyboardMarkup([['7', '30', '90', '365'], ['Отмена']], resize_keyboard=True)
+    )
+    return STATE_STATS_PERIOD
+
+
+def _format_report(report, currency: str) -> str:
+    last = report.end - timedelta(days=1)
+    lines = [
+        f"📊 <b>{report.start:%d.%m.%Y} – {last:%d.%m.%Y}</b>",
+        f"💵 Доходы: {report.income:.2f} {currency}",
+        f"💸 Расходы: {report.expense:.2f} {currency}",
+        f"📉 Средний расход за последние 7 дней: {report.moving_average:.2f} {currency}/день",
+    ]
+    if report.by_category:
+        lines.append("\n<b>По категориям</b>")
+        lines += [f"• {name}: {total:.2f}" for name, total in report.by_category.items()]
+    if len(report.months) > 1:
+        lines.append("\n<b>По месяцам</b>")
+        for month, total, change in report.months:
+            delta = '' if change is None else f" ({change:+.0f}%)"
+            lines.append(f"• {month}: {total:.2f}{delta}")
+    return "\n".join(lines)
+
+
+async def stats_period(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    period = parse_period(update.message.text)
+    if period is None:
+        await update.message.reply_text('⚠️ Не понял период. Пример: 30 или 01.09.2026-30.09.2026.')
+        return STATE_STATS_PERIOD
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    report = await run_db(get_period_report, user, *period)
+    await update.message.reply_text(_format_report(report, user.currency), parse_mode=ParseMode.HTML,
+                                    reply_markup=MAIN_MENU)
+    if any(report.by_category.values()):
+        buf = await chart_renderer.render('category_bar', user.id, report.by_category, 'Расходы по категориям')
+        await update.message.reply_photo(buf, caption='📊 Расходы по категориям за период', reply_markup=MAIN_MENU)
+    return ConversationHandler.END
+
+
 async def export_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    bio = export_transactions_csv(user)
-    await update.message.reply_document(document=bio, filename=bio.name, reply_markup=MAIN_MENU)
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    export = await run_db(export_transactions_csv, user)
+    try:
+        # PTB всё равно читает файл целиком, а у спула, не сброшенного на диск, name=None.
+        # Спул может лежать на диске, поэтому читается не в цикле событий.
+        data = await asyncio.to_thread(export.read)
+        await update.message.reply_document(document=data, filename=CSV_FILENAME, reply_markup=MAIN_MENU)
+    finally:
+        export.close()
 
 
 async def export_excel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    bio = export_transactions_excel(user)
-    await update.message.reply_document(document=bio, filename=bio.name, reply_markup=MAIN_MENU)
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    export = await run_db(export_transactions_excel, user)
+    try:
+        data = await asyncio.to_thread(export.read)
+        await update.message.reply_document(document=data, filename=XLSX_FILENAME, reply_markup=MAIN_MENU)
+    finally:
+        export.close()
+
+
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await update.message.reply_text('⚠️ Файл слишком большой.', reply_markup=MAIN_MENU)
+        return
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    try:
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_memory(out=spool)
+        spool.seek(0)
+        try:
+            result = await run_db(import_statement, user, spool, document.file_name or '')
+        except ValueError as exc:
+            await update.message.reply_text(f'⚠️ {exc}.', reply_markup=MAIN_MENU)
+            return
+    finally:
+        spool.close()
+    await update.message.reply_text(
+        f"📥 Импорт завершён: добавлено {result.inserted}, дублей пропущено {result.duplicates}, "
+        f"нераспознанных строк {result.invalid}, новых категорий {result.categories_created}.",
+        reply_markup=MAIN_MENU
+    )
 
 
 async def export_diagrams(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    buf1 = plot_monthly_category_bar(get_monthly_expenses_by_category(user))
-    buf2 = plot_balance_trend(get_balance_trend(user))
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    monthly = await run_db(get_monthly_expenses_by_category, user)
+    trend = await run_db(get_balance_trend, user)
+    buf1 = await chart_renderer.render('category_bar', user.id, monthly)
+    buf2 = await chart_renderer.render('balance_trend', user.id, trend)
     await update.message.reply_photo(buf1, caption='📊 Расходы по категориям за месяц', reply_markup=MAIN_MENU)
     await update.message.reply_photo(buf2, caption='📈 Динамика баланса за месяц', reply_markup=MAIN_MENU)
     return ConversationHandler.END
 
 
 async def currency_rates(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
+    user = await run_db(get_or_create_user, update.effective_user.id)
     try:
-        resp = requests.get(f"{LOCAL_API_URL}/api/rates?base={user.currency}")
-        data = resp.json()
+        data = await rates_service.aquote(user.currency)
         rates = data.get('rates', {})
         date = data.get('date')
         lines = [f"{cur}: {r:.4f}" for cur, r in rates.items()]
@@ -189,11 +310,10 @@ async def settings_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('🗂 Меню категорий:', reply_markup=CATEGORY_MENU)
         return STATE_NEW_CAT_NAME
     if text == 'Установить бюджет':
-        user = get_or_create_user(update.effective_user.id)
-        cats = Category.query.filter_by(user_id=user.id, type=CategoryType.expense).all()
-        keyboard = [[c.name] for c in cats] + [['Отмена']]
+        user = await run_db(get_or_create_user, update.effective_user.id)
+        cats = await run_db(get_categories, user, CategoryType.expense)
         await update.message.reply_text('💰 Выберите категорию:',
-                                        reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
+                                        reply_markup=category_keyboard(tuple(c.name for c in cats)))
         return STATE_BUDGET_CAT
     await update.message.reply_text('❌ Отменено.', reply_markup=MAIN_MENU)
     return ConversationHandler.END
@@ -203,9 +323,8 @@ async def set_currency(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.text == 'Отмена':
         await update.message.reply_text('❌ Отменено.', reply_markup=MAIN_MENU)
         return ConversationHandler.END
-    user = get_or_create_user(update.effective_user.id)
-    user.currency = update.message.text
-    db.session.commit()
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    user = await run_db(set_user_currency, user, update.message.text)
     await update.message.reply_text(f'✅ Валюта установлена: {user.currency}', reply_markup=MAIN_MENU)
     return ConversationHandler.END
 
@@ -229,11 +348,9 @@ async def new_category_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('❌ Отменено.', reply_markup=MAIN_MENU)
         return ConversationHandler.END
     ct = CategoryType.expense if choice == 'Расход' else CategoryType.income
-    user = get_or_create_user(update.effective_user.id)
+    user = await run_db(get_or_create_user, update.effective_user.id)
     name = context.user_data['new_cat']
-    if not Category.query.filter_by(user_id=user.id, name=name).first():
-        db.session.add(Category(user_id=user.id, name=name, type=ct))
-        db.session.commit()
+    if await run_db(add_category, user, name, ct):
         await update.message.reply_text(f'✅ Категория «{name}» добавлена.', reply_markup=MAIN_MENU)
     else:
         await update.message.reply_text('⚠️ Такая категория уже существует.', reply_markup=MAIN_MENU)
@@ -241,11 +358,10 @@ async def new_category_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def delete_category_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = get_or_create_user(update.effective_user.id)
-    cats = Category.query.filter_by(user_id=user.id).all()
-    keyboard = [[c.name] for c in cats] + [['Отмена']]
+    user = await run_db(get_or_create_user, update.effective_user.id)
+    cats = await run_db(get_categories, user)
     await update.message.reply_text('🗑 Выберите категорию для удаления:',
-                                    reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
+                                    reply_markup=category_keyboard(tuple(c.name for c in cats)))
     return STATE_DELETE_CAT_SELECT
 
 
@@ -264,11 +380,8 @@ async def delete_category_execute(update: Update, context: ContextTypes.DEFAULT_
     ans = update.message.text
     name = context.user_data.get('del_cat')
     if ans == 'Да' and name:
-        user = get_or_create_user(update.effective_user.id)
-        cat = Category.query.filter_by(user_id=user.id, name=name).first()
-        if cat:
-            db.session.delete(cat)
-            db.session.commit()
+        user = await run_db(get_or_create_user, update.effective_user.id)
+        if await run_db(delete_category, user, name):
             msg = f'✅ Категория «{name}» удалена.'
         else:
             msg = '⚠️ Категория не найдена.'
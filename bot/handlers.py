@@ -1,18 +1,26 @@
-from telegram.ext import Application, CommandHandler, MessageHandler, ConversationHandler, filters
+from itertools import chain
 
+from telegram.ext import Application, BaseHandler, CommandHandler, MessageHandler, ConversationHandler, filters
+
+from config import SUPPORTED_CURRENCIES
 from bot.commands import (
     start_command,
     add_transaction_entry,
     amount_received,
+    amount_invalid,
     category_received,
     show_balance,
+    quick_entry,
     stats_menu_handler,
     stats_today,
     stats_week,
     stats_month,
+    stats_categories,
+    stats_period,
     export_csv,
     export_excel,
     export_diagrams,
+    import_document,
     currency_rates,
     settings_menu,
     settings_choice,
@@ -27,6 +35,7 @@ from bot.commands import (
     STATE_AMOUNT,
     STATE_CATEGORY,
     STATE_STATS_CHOICE,
+    STATE_STATS_PERIOD,
     STATE_SETTINGS_CHOICE,
     STATE_CURRENCY_SELECT,
     STATE_NEW_CAT_NAME,
@@ -34,37 +43,56 @@ from bot.commands import (
     STATE_DELETE_CAT_SELECT,
     STATE_DELETE_CONFIRM,
 )
+from bot.keyboards import MAIN_MENU
+from utils.metrics import handler_metrics
 
 
 def register_handlers(app: Application):
+    persistent = app.persistence is not None
     app.add_handler(CommandHandler("start", start_command))
 
     transaction_conv = ConversationHandler(
+        name="transaction",
+        persistent=persistent,
         entry_points=[
             MessageHandler(filters.Regex(r"^(Добавить расход|Добавить доход)$"), add_transaction_entry)
         ],
         states={
             STATE_AMOUNT: [
-                MessageHandler(filters.Regex(r"^[0-9]+(\.[0-9]+)?$"), amount_received)
+                MessageHandler(filters.Regex(r"^[0-9]+(\.[0-9]+)?$"), amount_received),
+                # Только то, что похоже на сумму («500 руб», «1,5»): остальной текст
+                # не застревает в диалоге, а кнопки меню завершают его через fallbacks.
+                MessageHandler(filters.Regex(r"^\s*[-+]?\d"), amount_invalid),
             ],
             STATE_CATEGORY: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, category_received)
             ],
         },
-        fallbacks=[MessageHandler(filters.Regex(r"^Отмена$"), cancel_handler)],
+        fallbacks=[
+            MessageHandler(filters.Regex(r"^Отмена$"), cancel_handler),
+            MessageHandler(filters.Text([button.text for row in MAIN_MENU.keyboard for button in row]),
+                           cancel_handler),
+        ],
         allow_reentry=True,
     )
     app.add_handler(transaction_conv)
 
     app.add_handler(MessageHandler(filters.Regex(r"^Показать баланс$"), show_balance))
+    app.add_handler(CommandHandler("add", quick_entry))
 
     stats_conv = ConversationHandler(
+        name="stats",
+        persistent=persistent,
         entry_points=[MessageHandler(filters.Regex(r"^Статистика$"), stats_menu_handler)],
         states={
             STATE_STATS_CHOICE: [
                 MessageHandler(filters.Regex(r"^За день$"), stats_today),
                 MessageHandler(filters.Regex(r"^За неделю$"), stats_week),
                 MessageHandler(filters.Regex(r"^За месяц$"), stats_month),
+                MessageHandler(filters.Regex(r"^По категориям$"), stats_categories),
+            ],
+            STATE_STATS_PERIOD: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(r"^Отмена$"), stats_period)
             ],
         },
         fallbacks=[MessageHandler(filters.Regex(r"^Отмена$"), cancel_handler)],
@@ -76,15 +104,20 @@ def register_handlers(app: Application):
     app.add_handler(MessageHandler(filters.Regex(r"^Экспорт в XLSX$"), export_excel))
     app.add_handler(MessageHandler(filters.Regex(r"^Диаграммы$"), export_diagrams))
     app.add_handler(MessageHandler(filters.Regex(r"^Курс валют$"), currency_rates))
+    app.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("xlsx"), import_document
+    ))
 
     settings_conv = ConversationHandler(
+        name="settings",
+        persistent=persistent,
         entry_points=[MessageHandler(filters.Regex(r"^Настройки$"), settings_menu)],
         states={
             STATE_SETTINGS_CHOICE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, settings_choice)
             ],
             STATE_CURRENCY_SELECT: [
-                MessageHandler(filters.Regex(r"^(RUB|USD|EUR|Отмена)$"), set_currency)
+                MessageHandler(filters.Regex(rf"^({'|'.join(SUPPORTED_CURRENCIES)}|Отмена)$"), set_currency)
             ],
             STATE_NEW_CAT_NAME: [
                 MessageHandler(filters.Regex(r"^Добавить категорию$"), prompt_new_category),
@@ -104,3 +137,22 @@ def register_handlers(app: Application):
         allow_reentry=True,
     )
     app.add_handler(settings_conv)
+
+    # Быстрый ввод регистрируется после всех диалогов: «90 дней» в ответ на запрос
+    # периода или «500 руб» в ответ на запрос суммы должен получить диалог.
+    app.add_handler(MessageHandler(
+        filters.TEXT & ~filters.COMMAND & filters.Regex(r"^\s*\d+([.,]\d{1,2})?\s+\S"), quick_entry
+    ))
+
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            _instrument(handler)
+
+
+def _instrument(handler: BaseHandler) -> None:
+    # Замер времени и числа SQL-запросов на каждый вызов; метка — имя функции из bot.commands.
+    if isinstance(handler, ConversationHandler):
+        for nested in chain(handler.entry_points, *handler.states.values(), handler.fallbacks):
+            _instrument(nested)
+        return
+    handler.callback = handler_metrics.wrap(handler.callback)
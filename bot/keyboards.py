@@ -1,5 +1,10 @@
+from functools import lru_cache
+from typing import Tuple
+
 from telegram import ReplyKeyboardMarkup
 
+from config import SUPPORTED_CURRENCIES
+
 
 def build_keyboard(layout):
     return ReplyKeyboardMarkup(layout, resize_keyboard=True)
@@ -26,11 +31,18 @@ SETTINGS_MENU = build_keyboard([
 ])
 
 CURRENCY_MENU = build_keyboard([
-    ["RUB", "USD", "EUR"],
+    SUPPORTED_CURRENCIES,
     ["Назад"]
 ])
 
+CANCEL_MENU = build_keyboard([["Отмена"]])
+
 CATEGORY_MENU = build_keyboard([
     ["Добавить категорию", "Удалить категорию"],
     ["Назад"]
 ])
+
+
+@lru_cache(maxsize=1024)
+def category_keyboard(names: Tuple[str, ...]) -> ReplyKeyboardMarkup:
+    return build_keyboard([[name] for name in names] + [['Отмена']])
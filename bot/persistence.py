@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import pickle
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import PERSISTENCE_UPDATE_INTERVAL
+from utils.async_db import run_db
+from utils.database import db
+from utils.models import BotState
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["SQLitePersistence"]
+
+USER_DATA = "user_data"
+CONVERSATION = "conversation:"
+
+StateKey = Tuple[str, str]
+
+
+def _load(kind: str) -> Dict[str, bytes]:
+    rows = db.session.query(BotState.key, BotState.data).filter(BotState.kind == kind)
+    return {key: data for key, data in rows}
+
+
+def _write(batch: Dict[StateKey, Optional[bytes]]) -> None:
+    for (kind, key), data in batch.items():
+        if data is None:
+            BotState.query.filter_by(kind=kind, key=key).delete(synchronize_session=False)
+            continue
+        stmt = insert(BotState).values(kind=kind, key=key, data=data)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["kind", "key"],
+            set_={"data": stmt.excluded.data, "updated_at": db.func.current_timestamp()},
+        )
+        db.session.execute(stmt)
+    db.session.commit()
+
+
+class SQLitePersistence(BasePersistence):
+    """user_data и состояния ConversationHandler в таблице bot_state.
+
+    Application отдаёт изменения раз в update_interval; все изменения одного
+    прохода копятся в памяти и записываются одной транзакцией.
+    """
+
+    def __init__(self, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._pending: Dict[StateKey, Optional[bytes]] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.rows = 0
+        self.failures = 0
+
+    def _stage(self, kind: str, key: str, value) -> None:
+        self._pending[(kind, key)] = None if value is None else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        # Application вызывает update_* для всех изменений через asyncio.gather,
+        # так что к моменту запуска задачи весь проход уже в _pending.
+        try:
+            await asyncio.sleep(0)
+            while self._pending:
+                batch, self._pending = self._pending, {}
+                try:
+                    await run_db(_write, batch)
+                except Exception:
+                    # Пачка возвращается в очередь, но более новые значения тех же ключей,
+                    # накопленные за время записи, не перезаписываются. Запись повторится
+                    # со следующим изменением или при flush.
+                    logger.exception("Не удалось сохранить состояние бота (%s записей)", len(batch))
+                    self.failures += 1
+                    for key, data in batch.items():
+                        self._pending.setdefault(key, data)
+                    return
+                self.writes += 1
+                self.rows += len(batch)
+        finally:
+            self._writer = None
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        rows = await run_db(_load, USER_DATA)
+        return {int(key): pickle.loads(data) for key, data in rows.items()}
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = await run_db(_load, CONVERSATION + name)
+        return {tuple(json.loads(key)): pickle.loads(data) for key, data in rows.items()}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._stage(CONVERSATION + name, json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._stage(USER_DATA, str(user_id), data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage(USER_DATA, str(user_id), None)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._writer is not None:
+            await self._writer
+        if self._pending:
+            self._writer = asyncio.create_task(self._write_pending())
+            await self._writer
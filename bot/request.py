@@ -0,0 +1,26 @@
+import time
+
+from telegram.request import HTTPXRequest
+
+from utils.metrics import telegram_errors, telegram_requests
+
+__all__ = ["InstrumentedRequest"]
+
+
+class InstrumentedRequest(HTTPXRequest):
+    __slots__ = ()
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # Последний сегмент пути — метод Bot API; в остальной части пути токен бота.
+        api_method = "file" if "/file/bot" in url else url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            telegram_errors.inc(api_method)
+            raise
+        finally:
+            telegram_requests.observe(time.perf_counter() - started, api_method)
+        if status >= 400:
+            telegram_errors.inc(api_method)
+        return status, payload
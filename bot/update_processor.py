@@ -0,0 +1,94 @@
+import asyncio
+from typing import Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+__all__ = ["PerUserUpdateProcessor", "BoundedUpdateQueue"]
+
+
+def _user_key(update: object) -> Optional[int]:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Апдейты разных пользователей обрабатываются параллельно, одного — строго по очереди.
+
+    Сначала берётся лок пользователя, затем слот из concurrency: апдейт, ждущий
+    предыдущий апдейт того же пользователя, слот не занимает, и медленные апдейты
+    одного пользователя не задерживают остальных. Семафор PTB (max_pending) лишь
+    повторяет лимит BoundedUpdateQueue на число апдейтов в работе и в ожидании.
+    """
+
+    def __init__(self, concurrency: int, max_pending: int):
+        super().__init__(max(max_pending, concurrency))
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        # [лок, число апдейтов пользователя в работе и в ожидании]
+        self._locks: Dict[int, List] = {}
+
+    @property
+    def waiting_users(self) -> int:
+        return len(self._locks)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        key = _user_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """update_queue, который не отдаёт апдейт, пока max_pending уже взятых не обработаны.
+
+    Application создаёт задачу на каждый взятый апдейт и вызывает task_done по её
+    завершении, поэтому «взятые, но не завершённые» — это все задачи апдейтов,
+    включая ждущие семафор и лок пользователя. Пока лимит исчерпан, очередь
+    заполняется до maxsize, и put в Updater или webhook-воркере ждёт.
+    """
+
+    def __init__(self, max_pending: int, maxsize: Optional[int] = None):
+        super().__init__(max_pending if maxsize is None else maxsize)
+        self.max_pending = max_pending
+        self.taken = 0
+        self._released = asyncio.Event()
+
+    async def get(self):
+        while self.taken >= self.max_pending:
+            self._released.clear()
+            await self._released.wait()
+        return await super().get()
+
+    def get_nowait(self):
+        item = super().get_nowait()
+        self.taken += 1
+        return item
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.taken -= 1
+        self._released.set()
@@ -0,0 +1,201 @@
+import asyncio
+import hmac
+import logging
+import multiprocessing
+import signal
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from flask import Flask, abort, request
+from telegram import Bot, Update
+
+from config import (
+    API_LISTEN,
+    API_PORT,
+    BOT_TOKEN,
+    METRICS_PUSH_INTERVAL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    WEBHOOK_WORKERS,
+)
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_USER_FIELDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "business_message",
+)
+
+
+@dataclass
+class WebhookOptions:
+    workers: int = WEBHOOK_WORKERS
+    token: str = BOT_TOKEN
+    base_url: Optional[str] = None
+    url: str = WEBHOOK_URL
+    secret: str = WEBHOOK_SECRET
+    listen: str = WEBHOOK_LISTEN
+    port: int = WEBHOOK_PORT
+    path: str = WEBHOOK_PATH
+    api_listen: str = API_LISTEN
+    api_port: int = API_PORT
+    scheduler: bool = True
+    flask_config: dict = field(default_factory=dict)
+
+
+def shard_key(data: dict) -> int:
+    for name in _USER_FIELDS:
+        payload = data.get(name)
+        if not payload:
+            continue
+        sender = payload.get("from") or payload.get("chat") or {}
+        if "id" in sender:
+            return int(sender["id"])
+    return int(data.get("update_id", 0))
+
+
+def register_webhook_route(app: Flask, queues: List, options: WebhookOptions) -> None:
+    @app.route(options.path, methods=["POST"])
+    def telegram_webhook():
+        if options.secret:
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token, options.secret):
+                abort(403)
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            abort(400)
+        # Все апдейты одного пользователя попадают в один и тот же процесс, поэтому
+        # состояние ConversationHandler и порядок сообщений сохраняются.
+        queues[shard_key(data) % len(queues)].put(data)
+        return "", 200
+
+
+def _worker_main(index: int, queue, metrics_queue, options: WebhookOptions) -> None:
+    logging.basicConfig(
+        format=f"%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    from utils.app import create_app as create_flask_app
+    from utils.async_db import init_async_db
+
+    # Схему уже создал и смигрировал родительский процесс до запуска воркеров.
+    flask_app = create_flask_app(options.flask_config, migrate=False)
+    flask_app.app_context().push()
+    init_async_db(flask_app)
+    asyncio.run(_serve_updates(index, queue, metrics_queue, flask_app, options))
+
+
+async def _push_metrics(index: int, metrics_queue) -> None:
+    # /metrics отдаёт процесс с Flask, поэтому воркеры периодически присылают ему свои снимки.
+    while True:
+        await asyncio.sleep(METRICS_PUSH_INTERVAL)
+        metrics_queue.put((index, registry.snapshot()))
+
+
+def _collect_metrics(metrics_queue) -> None:
+    while True:
+        index, snapshot = metrics_queue.get()
+        registry.absorb(index, snapshot)
+
+
+async def _serve_updates(index: int, queue, metrics_queue, flask_app: Flask, options: WebhookOptions) -> None:
+    from bot.application import build_application
+    from utils.outbox import outbox
+    from utils.schedule_tasks import init_scheduler
+
+    application = build_application(options.token, options.base_url, polling=False)
+    loop = asyncio.get_running_loop()
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        scheduler = init_scheduler(outbox, flask_app) if index == 0 and options.scheduler else None
+        pusher = asyncio.create_task(_push_metrics(index, metrics_queue))
+        logger.info("Воркер %s готов", index)
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        pusher.cancel()
+        if scheduler:
+            scheduler.shutdown(wait=False)
+        await application.stop()
+        await application.post_shutdown(application)
+
+
+async def _set_webhook(options: WebhookOptions) -> None:
+    kwargs = {"base_url": options.base_url} if options.base_url else {}
+    async with Bot(options.token, **kwargs) as bot:
+        await bot.set_webhook(url=options.url, secret_token=options.secret or None)
+
+
+def _stop_workers(processes: List, queues: List, timeout: float = 10) -> None:
+    for process, queue in zip(processes, queues):
+        if process.is_alive():
+            queue.put(None)
+    for process in processes:
+        if process.pid is None:
+            continue
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning("Воркер %s не остановился за %s с, завершается принудительно", process.name, timeout)
+            process.terminate()
+            process.join(timeout)
+
+
+def run_webhook(options: Optional[WebhookOptions] = None) -> None:
+    from utils.app import create_app as create_flask_app
+
+    options = options or WebhookOptions()
+    # Миграции выполняются один раз здесь, до старта воркеров, а не в каждом процессе.
+    flask_app = create_flask_app(options.flask_config)
+    # Публичный слушатель отдаёт только webhook; /api/rates и /metrics остаются
+    # на локальном интерфейсе, как в режиме polling.
+    public_app = Flask(__name__)
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(options.workers)]
+    metrics_queue = ctx.Queue()
+    # Воркеры не демонические: демоническому процессу нельзя запускать дочерние,
+    # а ChartRenderer рендерит графики в собственном пуле процессов. Поэтому
+    # воркеры останавливаются явно в finally.
+    processes = [
+        ctx.Process(target=_worker_main, args=(i, queue, metrics_queue, options), name=f"bot-worker-{i}")
+        for i, queue in enumerate(queues)
+    ]
+    # SIGTERM (docker stop, systemd) должен пройти через finally и остановить воркеров.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for process in processes:
+            process.start()
+
+        register_webhook_route(public_app, queues, options)
+        threading.Thread(target=_collect_metrics, args=(metrics_queue,), name="metrics", daemon=True).start()
+        threading.Thread(
+            target=flask_app.run, kwargs={"host": options.api_listen, "port": options.api_port, "debug": False},
+            name="api", daemon=True,
+        ).start()
+        if options.url:
+            asyncio.run(_set_webhook(options))
+            logger.info("Webhook установлен: %s", options.url)
+
+        logger.info("Приём апдейтов на %s:%s%s, воркеров: %s",
+                    options.listen, options.port, options.path, options.workers)
+        public_app.run(host=options.listen, port=options.port, debug=False, threaded=True)
+    finally:
+        _stop_workers(processes, queues)
+
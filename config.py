@@ -2,8 +2,76 @@ BOT_TOKEN = "7499956970:AAE5U2QpQthPSe1zBwKc5b6ZNeW3EV-KbB4"
 
 SQLALCHEMY_DATABASE_URI = "sqlite:///finhelper.db"
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": 8,
+    "max_overflow": 8,
+    "pool_timeout": 30,
+    "pool_pre_ping": False,
+}
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+MIGRATION_LOCK_TIMEOUT_MS = 10 * 60 * 1000
 
 CURRENCY_API_URL = "https://api.exchangerate.host/latest"
-LOCAL_API_URL = "http://127.0.0.1:5000"
+CURRENCY_FALLBACK_API_URL = "https://open.er-api.com/v6/latest"
+SUPPORTED_CURRENCIES = ["RUB", "USD", "EUR"]
+RATES_TTL = 600
+RATES_STALE_TTL = 6 * 3600
+RATES_REFRESH_INTERVAL = 300
+RATES_HEDGE_DELAY = 0.3
+RATES_TIMEOUT = 5
+# /api/rates принимает любую базу; записи сверх лимита вытесняются по LRU.
+RATES_CACHE_SIZE = 64
+# /api/rates и /metrics: только локальный интерфейс, наружу открыт лишь путь webhook.
+API_LISTEN = "127.0.0.1"
+API_PORT = 5000
+
+RUN_MODE = "polling"
+WEBHOOK_URL = ""
+WEBHOOK_SECRET = ""
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_WORKERS = 4
+
+UPDATE_CONCURRENCY = 32
+UPDATE_MAX_PENDING = 256
+
+PERSISTENCE_ENABLED = True
+PERSISTENCE_UPDATE_INTERVAL = 5
+
+METRICS_PUSH_INTERVAL = 15
 
 DAILY_SUMMARY_HOUR = 20
+BUDGET_ALERT_THRESHOLD = 0.8
+JOB_CHUNK_SIZE = 1000
+
+# Время зависит от машины: бюджет проверяют benchmarks.importtime и `pytest --benchmarks`,
+# а в обычном прогоне тестов — только отсутствие модулей из STARTUP_DEFERRED_MODULES.
+STARTUP_IMPORT_BUDGET_MS = 1000
+STARTUP_DEFERRED_MODULES = ["matplotlib", "pandas", "numpy", "openpyxl"]
+
+CHART_WORKERS = 2
+CHART_CACHE_SIZE = 256
+
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024
+
+DB_EXECUTOR_WORKERS = 4
+
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 300
+
+OUTBOX_RATE = 25
+OUTBOX_PER_CHAT_INTERVAL = 1.0
+OUTBOX_WORKERS = 16
+OUTBOX_MAX_RETRIES = 3
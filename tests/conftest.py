@@ -0,0 +1,31 @@
+import pytest
+
+from utils.app import create_app
+from utils.helpers import _category_cache, _user_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Кэши модульные и переживают смену базы между тестами.
+    _user_cache.clear()
+    _category_cache.clear()
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}"})
+    with app.app_context():
+        yield app
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmarks", action="store_true", help="запустить тесты с бюджетом по времени")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: бюджет по времени, зависит от машины; только с --benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="нужен --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,61 @@
+import asyncio
+
+from utils.helpers import add_category, create_transaction, get_or_create_user, set_budget
+from utils.models import Budget, CategoryType
+from utils.outbox import outbox
+from utils.schedule_tasks import check_budgets
+
+
+class RecordingOutbox:
+    def __init__(self):
+        self.messages = []
+
+    def enqueue(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+class RecordingBot:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+def _user_with_budget():
+    user = get_or_create_user(42)
+    add_category(user, "Кафе", CategoryType.expense)
+    set_budget(user, "Кафе", 100)
+    return user
+
+
+def test_alert_without_outbox_is_left_to_check_budgets(app):
+    user = _user_with_budget()
+    create_transaction(user, 150, CategoryType.expense, "Кафе")
+    assert Budget.query.one().alert_level == 0
+
+    pending = RecordingOutbox()
+    check_budgets(pending, app)
+    assert [chat_id for chat_id, _ in pending.messages] == [42]
+    assert Budget.query.one().alert_level == 100
+
+
+def test_alert_is_sent_when_the_transaction_is_written(app):
+    user = _user_with_budget()
+    bot = RecordingBot()
+
+    async def scenario():
+        await outbox.start(bot)
+        try:
+            create_transaction(user, 150, CategoryType.expense, "Кафе")
+            await outbox.join()
+        finally:
+            await outbox.stop()
+
+    asyncio.run(scenario())
+    assert [chat_id for chat_id, _ in bot.messages] == [42]
+    assert Budget.query.one().alert_level == 100
+
+    pending = RecordingOutbox()
+    check_budgets(pending, app)
+    assert pending.messages == []
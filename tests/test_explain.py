@@ -0,0 +1,8 @@
+from utils.migrations import explain_hot_queries, is_full_scan
+
+
+def test_hot_queries_use_indexes(app):
+    report = explain_hot_queries()
+    assert report
+    scans = {name: step for name, plan in report for step in plan if is_full_scan(step)}
+    assert not scans
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from telegram import Update
+
+from benchmarks.fake_telegram import FakeTelegramAPI, text_update
+from bot.application import build_application
+from utils.app import create_app
+from utils.async_db import init_async_db, shutdown_async_db
+from utils.helpers import _category_cache, _user_cache
+
+
+class RecordingAPI(FakeTelegramAPI):
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def handle(self, method, params):
+        if method.startswith("send"):
+            self.texts.append(params.get("text", ""))
+        return super().handle(method, params)
+
+
+@pytest.fixture
+def chat(tmp_path):
+    _user_cache.clear()
+    _category_cache.clear()
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'bot.db'}"})
+    api = RecordingAPI()
+    with app.app_context():
+        init_async_db(app)
+
+        def run(*messages, user_id=7001):
+            async def scenario():
+                application = build_application("1:test", f"{api.url}/bot", polling=False, persistence=False)
+                async with application:
+                    await application.start()
+                    for i, text in enumerate(messages):
+                        update = Update.de_json(text_update(i + 1, user_id, text), application.bot)
+                        await application.update_queue.put(update)
+                        await application.update_queue.join()
+                    await application.stop()
+
+            del api.texts[:]
+            asyncio.run(scenario())
+            return list(api.texts)
+
+        yield run
+        shutdown_async_db()
+    api.close()
+
+
+def test_menu_button_ends_amount_prompt(chat):
+    replies = chat("Добавить расход", "Показать баланс", "500 Еда")
+    assert replies[1] == "❌ Операция отменена."
+    assert replies[2].startswith("✅ Сохранено операций: 1")
+
+
+def test_amount_prompt_rejects_amount_like_text(chat):
+    replies = chat("Добавить расход", "500 руб", "Отмена")
+    assert replies[1] == "⚠️ Введите число или нажмите «Отмена»."
+    assert replies[2] == "❌ Операция отменена."
+
+
+def test_other_text_is_not_trapped_by_amount_prompt(chat):
+    replies = chat("Добавить расход", "привет", "100")
+    assert replies == ["💸 Введите сумму расхода:", "🗂 Выберите категорию:"]
@@ -0,0 +1,30 @@
+from utils.helpers import add_category, create_transactions, get_or_create_user, parse_quick_entries
+from utils.models import Category, CategoryType, Transaction
+from utils.database import db
+
+
+def test_quick_entry_rejects_zero_amounts():
+    entries, invalid = parse_quick_entries("0 Еда\n0,00 Такси\n0.5 Кофе")
+    assert entries == [("0.5", "Кофе")]
+    assert invalid == ["0 Еда", "0,00 Такси"]
+
+
+def test_add_category_is_case_insensitive(app):
+    user = get_or_create_user(1)
+    assert add_category(user, "Кофе", CategoryType.expense)
+    assert not add_category(user, "КОФЕ", CategoryType.income)
+    assert not add_category(user, "еда", CategoryType.income)
+
+
+def test_quick_entry_reports_names_that_differ_only_in_case(app):
+    user = get_or_create_user(1)
+    # Такие пары остались от версий без проверки регистра.
+    db.session.add(Category(user_id=user.id, name="ЕДА", type=CategoryType.income))
+    db.session.commit()
+    add_category(user, "Кофе", CategoryType.expense)
+
+    saved, unknown, ambiguous = create_transactions(user, [("100", "еда"), ("50", "кофе"), ("1", "Такси")])
+    assert [cat.name for _, cat in saved] == ["Кофе"]
+    assert unknown == ["Такси"]
+    assert ambiguous == ["еда"]
+    assert Transaction.query.count() == 1
@@ -0,0 +1,19 @@
+import io
+
+from utils.helpers import get_categories, get_or_create_user
+from utils.importer import import_statement
+from utils.models import CategoryType
+
+
+def _csv(*lines):
+    return io.BytesIO("\n".join(("Дата;Сумма;Категория;Тип",) + lines).encode())
+
+
+def test_import_keeps_category_names_unique_ignoring_case(app):
+    user = get_or_create_user(1)
+    result = import_statement(user, _csv("2024-01-05;100;ЕДА;расход", "2024-01-06;200;ЕДА;доход"), "bank.csv")
+
+    assert result.inserted == 2
+    names = {c.name.lower(): c for c in get_categories(user)}
+    assert len(names) == len(get_categories(user))
+    assert names["еда (доход)"].type == CategoryType.income
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.importtime import measure
+from config import STARTUP_DEFERRED_MODULES, STARTUP_IMPORT_BUDGET_MS
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return measure("app")
+
+
+def test_deferred_modules_are_not_imported_at_startup(rows):
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    assert not loaded & set(STARTUP_DEFERRED_MODULES)
+
+
+@pytest.mark.benchmark
+def test_startup_import_within_budget(rows):
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+    assert total_ms <= STARTUP_IMPORT_BUDGET_MS
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from utils.outbox import Outbox, TokenBucket
+
+
+class FakeBot:
+    """Отвечает ошибками из сценария для chat_id, затем успехом; запоминает время отправок."""
+
+    def __init__(self, failures=None):
+        self.failures = {chat_id: list(errors) for chat_id, errors in (failures or {}).items()}
+        self.sent = []
+        self.failed_at = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        errors = self.failures.get(chat_id)
+        if errors:
+            self.failed_at.append(time.monotonic())
+            raise errors.pop(0)
+        self.sent.append((chat_id, time.monotonic()))
+
+
+def _deliver(bot, chats, **kwargs):
+    async def scenario():
+        box = Outbox(**{"rate": 1000, "per_chat_interval": 0, "workers": 4, **kwargs})
+        await box.start(bot)
+        try:
+            for chat_id in chats:
+                box.enqueue(chat_id, "текст")
+            await box.join()
+        finally:
+            await box.stop()
+        return box
+
+    return asyncio.run(scenario())
+
+
+def test_retry_after_pauses_every_worker():
+    bot = FakeBot({1: [RetryAfter(timedelta(seconds=0.3))]})
+    box = _deliver(bot, [1] + [2] * 5)
+
+    resume = bot.failed_at[0] + 0.3
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 2, 2, 2, 2, 2]
+    late = [at for chat_id, at in bot.sent if at > bot.failed_at[0]]
+    assert late and all(at >= resume - 0.01 for at in late)
+    assert box.retried == 1 and box.sent == 6
+
+
+def test_forbidden_goes_to_dead_letters_without_retry():
+    bot = FakeBot({1: [Forbidden("bot was blocked by the user")]})
+    box = _deliver(bot, [1, 2])
+
+    assert [m.chat_id for m in box.dead_letters] == [1]
+    assert box.retried == 0 and box.sent == 1
+
+
+def test_timeouts_are_retried_up_to_the_limit():
+    bot = FakeBot({1: [TimedOut()] * 3, 2: [TimedOut()]})
+    box = _deliver(bot, [1, 2], max_retries=2)
+
+    assert [m.chat_id for m in box.dead_letters] == [1]
+    assert box.dead_letters[0].attempts == 3
+    assert [chat_id for chat_id, _ in bot.sent] == [2]
+    assert box.retried == 3
+
+
+def test_outbox_sends_at_the_configured_rate():
+    bot = FakeBot()
+    _deliver(bot, range(11), rate=20)
+
+    times = sorted(at for _, at in bot.sent)
+    assert 0.45 <= times[-1] - times[0] < 0.8
+
+
+def test_token_bucket_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=50)
+        started = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert 0.18 <= asyncio.run(scenario()) < 0.4
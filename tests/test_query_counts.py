@@ -0,0 +1,29 @@
+import pytest
+
+from utils.database import count_queries
+from utils.helpers import (
+    add_category,
+    get_balance,
+    get_daily_expenses,
+    get_monthly_expenses_by_category,
+    get_or_create_user,
+)
+from utils.models import CategoryType
+
+# Число SQL-запросов агрегатов не должно зависеть от количества категорий.
+EXPECTED = {
+    get_balance: 1,
+    get_daily_expenses: 2,
+    get_monthly_expenses_by_category: 1,
+}
+
+
+@pytest.mark.parametrize("categories", [0, 50])
+@pytest.mark.parametrize("func, expected", EXPECTED.items(), ids=[func.__name__ for func in EXPECTED])
+def test_query_count_does_not_depend_on_categories(app, func, expected, categories):
+    user = get_or_create_user(1)
+    for i in range(categories):
+        add_category(user, f"Категория {i}", CategoryType.expense)
+    with count_queries() as statements:
+        func(user)
+    assert len(statements) == expected, statements
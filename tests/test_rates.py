@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from benchmarks.fake_providers import FakeProvider
+from utils.rates import HedgedFetcher, RateProvider, RatesService
+
+
+@pytest.fixture
+def provider():
+    provider = FakeProvider()
+    yield provider
+    provider.close()
+
+
+def _service(provider, **kwargs):
+    return RatesService(HedgedFetcher([RateProvider("fake", provider.url)]), **kwargs)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_miss_fetches_and_fresh_hit_is_served_from_cache(provider):
+    service = _service(provider)
+    first = service.get("usd")
+    assert first["base"] == "USD" and first["rates"]
+    assert service.get("USD") is first
+    assert provider.requests == 1
+
+
+def test_stale_entry_is_served_while_refreshing_in_background(provider):
+    service = _service(provider, ttl=0.05, stale_ttl=60)
+    stale = service.get("RUB")
+    time.sleep(0.1)
+    provider.latency = 0.3
+
+    started = time.perf_counter()
+    assert service.get("RUB") is stale
+    assert time.perf_counter() - started < 0.1
+    _wait_for(lambda: service.peek("RUB") is not stale)
+    assert provider.requests == 2
+
+
+def test_refresh_all_fills_every_supported_base(provider):
+    service = _service(provider)
+    service.refresh_all(["RUB", "USD", "EUR"])
+    assert provider.requests == 3
+    assert all(service.peek(base) for base in ("RUB", "USD", "EUR"))
+
+
+def test_cache_is_bounded_by_least_recently_used_base(provider):
+    service = _service(provider, cache_size=2)
+    service.get("RUB")
+    service.get("USD")
+    service.get("RUB")
+    service.get("GBP")
+    assert service.peek("USD") is None
+    assert service.peek("RUB") and service.peek("GBP")
+
+
+def test_hedged_fetch_falls_back_to_next_provider():
+    slow, broken, fast = FakeProvider(latency=0.5), FakeProvider(error_rate=1.0), FakeProvider()
+    try:
+        fetcher = HedgedFetcher([RateProvider("slow", slow.url), RateProvider("broken", broken.url),
+                                 RateProvider("fast", fast.url)], hedge_delay=0.05)
+        started = time.perf_counter()
+        data = fetcher("EUR")
+        assert data["rates"]
+        assert time.perf_counter() - started < 0.3
+        assert broken.requests == 1 and fast.requests == 1
+    finally:
+        for provider in (slow, broken, fast):
+            provider.close()
+
+
+def test_api_accepts_any_base(app, provider, monkeypatch):
+    monkeypatch.setattr("utils.app.rates_service", _service(provider))
+    resp = app.test_client().get("/api/rates?base=gbp&symbols=USD")
+    assert resp.status_code == 200
+    assert resp.get_json()["base"] == "GBP"
+    assert list(resp.get_json()["rates"]) == ["USD"]
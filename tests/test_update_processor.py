@@ -0,0 +1,57 @@
+import asyncio
+import time
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+
+from bot.update_processor import PerUserUpdateProcessor
+
+
+def _update(update_id, user_id):
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(user_id, Chat.PRIVATE),
+        from_user=User(user_id, "user", False),
+    )
+    return Update(update_id, message=message)
+
+
+def test_slow_user_does_not_delay_other_users():
+    async def scenario():
+        processor = PerUserUpdateProcessor(concurrency=4, max_pending=64)
+        finished = {}
+
+        async def handle(name, delay):
+            await asyncio.sleep(delay)
+            finished[name] = time.perf_counter()
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(processor.process_update(_update(i, 1), handle(f"a{i}", 0.2)))
+                 for i in range(6)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(processor.process_update(_update(100, 2), handle("b", 0.01))))
+        await asyncio.gather(*tasks)
+        return finished["b"] - started, [finished[f"a{i}"] for i in range(6)]
+
+    other_user, own_updates = asyncio.run(scenario())
+    assert other_user < 0.15
+    assert own_updates == sorted(own_updates)
+
+
+def test_concurrency_limits_running_updates():
+    async def scenario():
+        processor = PerUserUpdateProcessor(concurrency=2, max_pending=64)
+        running = peak = 0
+
+        async def handle():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+
+        await asyncio.gather(*(processor.process_update(_update(i, i), handle()) for i in range(8)))
+        return peak
+
+    assert asyncio.run(scenario()) == 2
@@ -0,0 +1,111 @@
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import JOB_CHUNK_SIZE
+from utils.database import db
+from utils.models import Budget, Category, CategoryType, DailyRollup, User
+
+
+def _period(query, start: date, end: Optional[date]):
+    query = query.filter(DailyRollup.day >= start)
+    if end is not None:
+        query = query.filter(DailyRollup.day < end)
+    return query
+
+
+def totals_by_type(user_id: int, start: date, end: Optional[date] = None) -> Tuple[int, int]:
+    income = db.func.sum(db.case((DailyRollup.type == CategoryType.income, DailyRollup.total), else_=0))
+    expense = db.func.sum(db.case((DailyRollup.type == CategoryType.expense, DailyRollup.total), else_=0))
+    query = db.session.query(income, expense).filter(DailyRollup.user_id == user_id)
+    inc, exp = _period(query, start, end).one()
+    return inc or 0, exp or 0
+
+
+def totals_by_category(
+        user_id: int,
+        start: date,
+        end: Optional[date] = None,
+        ctype: CategoryType = CategoryType.expense,
+) -> Dict[str, int]:
+    on = [
+        DailyRollup.category_id == Category.id,
+        DailyRollup.user_id == user_id,
+        DailyRollup.type == ctype,
+        DailyRollup.day >= start,
+    ]
+    if end is not None:
+        on.append(DailyRollup.day < end)
+    rows = (
+        db.session.query(Category.name, db.func.coalesce(db.func.sum(DailyRollup.total), 0))
+        .outerjoin(DailyRollup, db.and_(*on))
+        .filter(Category.user_id == user_id, Category.type == ctype)
+        .group_by(Category.id)
+        .order_by(Category.id)
+        .all()
+    )
+    return {name: total for name, total in rows}
+
+
+def category_total(user_id: int, category_id: int, start: date, end: Optional[date] = None,
+                   ctype: CategoryType = CategoryType.expense) -> int:
+    query = db.session.query(db.func.sum(DailyRollup.total)).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.category_id == category_id,
+        DailyRollup.type == ctype,
+    )
+    return _period(query, start, end).scalar() or 0
+
+
+def daily_net(user_id: int, start: date, end: Optional[date] = None) -> List[Tuple[date, int]]:
+    signed = db.case((DailyRollup.type == CategoryType.income, DailyRollup.total), else_=-DailyRollup.total)
+    query = db.session.query(DailyRollup.day, db.func.sum(signed)).filter(DailyRollup.user_id == user_id)
+    return _period(query, start, end).group_by(DailyRollup.day).order_by(DailyRollup.day).all()
+
+
+def expenses_by_user(day: date, chunk_size: int = JOB_CHUNK_SIZE) -> Iterator[Tuple[int, str, int]]:
+    spent = (
+        db.session.query(DailyRollup.user_id, db.func.sum(DailyRollup.total).label("total"))
+        .filter(DailyRollup.day == day, DailyRollup.type == CategoryType.expense)
+        .group_by(DailyRollup.user_id)
+        .subquery()
+    )
+    yield from (
+        db.session.query(User.telegram_id, User.currency, db.func.coalesce(spent.c.total, 0))
+        .outerjoin(spent, spent.c.user_id == User.id)
+        .order_by(User.id)
+        .yield_per(chunk_size)
+    )
+
+
+def budgets_over(start: date, threshold: float,
+                 chunk_size: int = JOB_CHUNK_SIZE) -> Iterator[Tuple]:
+    spent = (
+        db.session.query(
+            DailyRollup.user_id,
+            DailyRollup.category_id,
+            db.func.sum(DailyRollup.total).label("total"),
+        )
+        .filter(DailyRollup.day >= start, DailyRollup.type == CategoryType.expense)
+        .group_by(DailyRollup.user_id, DailyRollup.category_id)
+        .subquery()
+    )
+    total = db.func.coalesce(spent.c.total, 0)
+    yield from (
+        db.session.query(
+            Budget.id,
+            Budget.alert_level,
+            Budget.alert_month,
+            User.telegram_id,
+            User.currency,
+            Category.name,
+            total,
+            Budget.amount,
+        )
+        .select_from(Budget)
+        .join(User, User.id == Budget.user_id)
+        .join(Category, Category.id == Budget.category_id)
+        .outerjoin(spent, db.and_(spent.c.user_id == Budget.user_id, spent.c.category_id == Budget.category_id))
+        .filter(Budget.amount > 0, total >= Budget.amount * threshold)
+        .order_by(Budget.id)
+        .yield_per(chunk_size)
+    )
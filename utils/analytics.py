@@ -0,0 +1,134 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from utils.database import db
+from utils.models import Category, CategoryType, DailyRollup
+from utils.money import from_minor
+
+__all__ = ["PeriodReport", "load_columns", "balance_trend", "period_report", "parse_period"]
+
+# numpy импортируется внутри функций, как matplotlib в utils.viz: модуль
+# подключается при старте бота, а сама библиотека нужна только для отчётов.
+
+MOVING_AVERAGE_DAYS = 7
+MAX_PERIOD_DAYS = 3 * 366
+
+_RANGE = re.compile(r"^\s*(\d{1,2}\.\d{1,2}\.\d{4})\s*[-–—]\s*(\d{1,2}\.\d{1,2}\.\d{4})\s*$")
+
+
+@dataclass
+class PeriodReport:
+    start: date
+    end: date
+    income: float
+    expense: float
+    by_category: Dict[str, float]
+    balance: List[Tuple[date, float]]
+    moving_average: float
+    months: List[Tuple[str, float, Optional[float]]]
+
+
+def load_columns(user_id: int, start: date, end: date):
+    import numpy as np
+
+    # Сводка уже сгруппирована по дням, поэтому строк не больше, чем дней × категорий,
+    # даже если транзакций у пользователя миллион.
+    signed = db.case((DailyRollup.type == CategoryType.income, DailyRollup.total), else_=-DailyRollup.total)
+    rows = db.session.execute(
+        db.select(DailyRollup.day, signed, db.func.coalesce(DailyRollup.category_id, -1))
+        .where(DailyRollup.user_id == user_id, DailyRollup.day >= start, DailyRollup.day < end)
+    ).all()
+    if not rows:
+        return (np.empty(0, dtype="int64"),) * 3
+    days, amounts, categories = zip(*rows)
+    offsets = (np.array(days, dtype="datetime64[D]") - np.datetime64(start, "D")).astype("int64")
+    return offsets, np.array(amounts, dtype="int64"), np.array(categories, dtype="int64")
+
+
+def _daily(offsets, amounts, length: int):
+    import numpy as np
+
+    daily = np.zeros(length, dtype="int64")
+    np.add.at(daily, offsets, amounts)
+    return daily
+
+
+def balance_trend(user_id: int, start: date, end: date) -> List[Tuple[date, float]]:
+    import numpy as np
+
+    length = (end - start).days
+    offsets, amounts, _ = load_columns(user_id, start, end)
+    cumulative = from_minor(np.cumsum(_daily(offsets, amounts, length)))
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D")).astype(date)
+    return list(zip(days.tolist(), cumulative.tolist()))
+
+
+def period_report(user_id: int, start: date, end: date) -> PeriodReport:
+    import numpy as np
+
+    length = (end - start).days
+    offsets, amounts, categories = load_columns(user_id, start, end)
+    daily = _daily(offsets, amounts, length)
+    expense_mask = amounts < 0
+
+    names = dict(
+        db.session.query(Category.id, Category.name)
+        .filter(Category.user_id == user_id, Category.type == CategoryType.expense)
+        .order_by(Category.id)
+    )
+    ids, inverse = np.unique(categories[expense_mask], return_inverse=True)
+    spent = np.bincount(inverse, weights=-amounts[expense_mask], minlength=len(ids)).astype("int64")
+    order = np.argsort(-spent, kind="stable")
+    by_category = {names.get(int(ids[i]), "Без категории"): from_minor(int(spent[i])) for i in order}
+
+    window = min(MOVING_AVERAGE_DAYS, length)
+    daily_expense = np.zeros(length, dtype="int64")
+    np.add.at(daily_expense, offsets[expense_mask], -amounts[expense_mask])
+    moving = np.convolve(daily_expense, np.ones(window), mode="valid") / window
+
+    day_axis = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D"))
+    month_axis = day_axis.astype("datetime64[M]")
+    month_keys, month_index = np.unique(month_axis, return_inverse=True)
+    per_month = np.bincount(month_index, weights=daily_expense, minlength=len(month_keys))
+    previous = np.concatenate(([np.nan], per_month[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = np.where(previous > 0, (per_month - previous) / previous * 100, np.nan)
+    months = [
+        (str(key), from_minor(float(total)), None if np.isnan(change) else float(change))
+        for key, total, change in zip(month_keys, per_month, delta)
+    ]
+
+    cumulative = from_minor(np.cumsum(daily))
+    return PeriodReport(
+        start=start,
+        end=end,
+        income=from_minor(int(amounts[~expense_mask].sum())),
+        expense=from_minor(int(-amounts[expense_mask].sum())),
+        by_category=by_category,
+        balance=list(zip(day_axis.astype(date).tolist(), cumulative.tolist())),
+        moving_average=from_minor(float(moving[-1])) if len(moving) else 0.0,
+        months=months,
+    )
+
+
+def parse_period(text: str, today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+    # «30» — последние 30 дней, «01.09.2026-30.09.2026» — диапазон включительно.
+    today = today or datetime.now(timezone.utc).date()
+    text = text.strip()
+    if text.isdigit():
+        days = int(text)
+        if not 0 < days <= MAX_PERIOD_DAYS:
+            return None
+        return today - timedelta(days=days - 1), today + timedelta(days=1)
+    match = _RANGE.match(text)
+    if not match:
+        return None
+    try:
+        start, last = (datetime.strptime(value, "%d.%m.%Y").date() for value in match.groups())
+    except ValueError:
+        return None
+    if last < start or (last - start).days >= MAX_PERIOD_DAYS:
+        return None
+    return start, last + timedelta(days=1)
@@ -1,15 +1,20 @@
-from flask import Flask, jsonify, request
-import requests
+from flask import Flask, Response, jsonify, request
 
 from utils.database import init_db
+from utils.importer import register_commands as register_import_commands
+from utils.metrics import registry
+from utils.migrations import register_commands as register_migration_commands
+from utils.rates import rates_service
+from utils.rollups import register_commands as register_rollup_commands
 
-PRIMARY_API = "https://api.exchangerate.host/latest"
-FALLBACK_API = "https://open.er-api.com/v6/latest"
 
-
-def create_app():
+def create_app(config=None, migrate=True):
     app = Flask(__name__)
-    init_db(app)
+    app.config.update(config or {})
+    init_db(app, migrate=migrate)
+    register_rollup_commands(app)
+    register_migration_commands(app)
+    register_import_commands(app)
 
     @app.route("/api/rates")
     def get_rates():
@@ -17,37 +22,12 @@ def create_app():
         symbols = request.args.get("symbols", "USD,EUR,RUB").upper()
         targets = [s.strip() for s in symbols.split(",") if s.strip()]
 
-        rates = {}
-        date = None
-
-        try:
-            resp = requests.get(f"{PRIMARY_API}?base={base}&symbols={symbols}", timeout=5)
-            data = resp.json()
-            rates = data.get("rates", {})
-            date = data.get("date")
-        except Exception:
-            pass
-
-        if not rates:
-            try:
-                resp = requests.get(f"{PRIMARY_API}?base={base}", timeout=5)
-                full = resp.json().get("rates", {})
-                date = resp.json().get("date") or date
-                rates = {cur: full[cur] for cur in targets if cur in full}
-            except Exception:
-                pass
-
-        if not rates:
-            try:
-                resp = requests.get(f"{FALLBACK_API}/{base}", timeout=5)
-                data = resp.json()
-                fallback = data.get("rates", {})
-                date = data.get("time_last_update_utc") or date
-                rates = {cur: fallback[cur] for cur in targets if cur in fallback}
-            except Exception:
-                pass
-
-        return jsonify({"base": base, "date": date, "rates": rates})
+        data = rates_service.quote(base, targets)
+        return jsonify({"base": base, "date": data["date"], "rates": data["rates"]})
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
     return app
 
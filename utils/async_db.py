@@ -0,0 +1,43 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from flask import Flask
+
+from config import DB_EXECUTOR_WORKERS
+
+__all__ = ["init_async_db", "run_db", "shutdown_async_db"]
+
+_app: Optional[Flask] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def init_async_db(app: Flask, workers: int = DB_EXECUTOR_WORKERS) -> None:
+    global _app, _executor
+    _app = app
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+
+def shutdown_async_db() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _call_in_app_context(func: Callable[..., Any], *args, **kwargs) -> Any:
+    # Каждый вызов получает свой контекст приложения, а значит и свою сессию,
+    # которая закрывается при выходе из контекста.
+    with _app.app_context():
+        return func(*args, **kwargs)
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    if _executor is None:
+        raise RuntimeError("init_async_db() не вызван")
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, _call_in_app_context, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
@@ -1,15 +1,66 @@
+from contextlib import contextmanager
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from config import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
+from sqlalchemy import event
+from config import (
+    SQLALCHEMY_DATABASE_URI,
+    SQLALCHEMY_ENGINE_OPTIONS,
+    SQLALCHEMY_TRACK_MODIFICATIONS,
+    SQLITE_PRAGMAS,
+)
+from utils.metrics import install_sql_hook
 
-__all__ = ["db", "init_db"]
+__all__ = ["db", "init_db", "count_queries"]
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"expire_on_commit": False})
 
 
-def init_db(app: Flask):
-    app.config["SQLALCHEMY_DATABASE_URI"] = SQLALCHEMY_DATABASE_URI
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = SQLALCHEMY_TRACK_MODIFICATIONS
+def init_db(app: Flask, migrate: bool = True):
+    app.config.setdefault("SQLALCHEMY_DATABASE_URI", SQLALCHEMY_DATABASE_URI)
+    app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", SQLALCHEMY_TRACK_MODIFICATIONS)
+    # Для SQLite в памяти Flask-SQLAlchemy ставит StaticPool, который не принимает настройки пула.
+    if not _is_memory_sqlite(app.config["SQLALCHEMY_DATABASE_URI"]):
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", SQLALCHEMY_ENGINE_OPTIONS)
+    app.config.setdefault("SQLITE_PRAGMAS", SQLITE_PRAGMAS)
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == "sqlite":
+            _install_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+        install_sql_hook(db.engine)
+        if migrate:
+            from utils.migrations import init_schema
+            init_schema(db.engine, db.metadata)
+
+
+def _is_memory_sqlite(uri: str) -> bool:
+    return uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri
+
+
+def _install_pragmas(engine, pragmas: dict) -> None:
+    if not pragmas:
+        return
+
+    # PRAGMA действуют на соединение, поэтому применяются к каждому новому соединению пула.
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+@contextmanager
+def count_queries(with_parameters: bool = False):
+    # with_parameters=True: вместо текста SQL собираются пары (SQL, параметры).
+    statements = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters) if with_parameters else statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
@@ -1,23 +1,57 @@
 import io
 import csv
-from datetime import datetime, timedelta, time, timezone
-from typing import Dict, List, Tuple, Optional
-
-import pandas as pd
+import re
+import tempfile
+from datetime import date, datetime, timedelta, time, timezone
+from typing import BinaryIO, Dict, List, Tuple, Optional
 
+from config import (
+    BUDGET_ALERT_THRESHOLD,
+    EXPORT_CHUNK_SIZE,
+    EXPORT_SPOOL_MAX_SIZE,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+)
+from utils.aggregates import totals_by_type, totals_by_category, category_total
+from utils.analytics import PeriodReport, balance_trend, period_report
+from utils.cache import TTLCache, invalidate_user
 from utils.database import db
 from utils.models import User, Category, Transaction, CategoryType, Budget
+from utils.money import format_minor, from_minor, to_minor
+from utils.outbox import outbox
+from utils.rollups import apply_totals, apply_transaction, detach_category
 
 BOM = '\ufeff'
+CSV_FILENAME = 'transactions.csv'
+XLSX_FILENAME = 'transactions.xlsx'
+
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, name="users")
+_category_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, name="categories")
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _month_start() -> date:
+    return _today().replace(day=1)
+
+
+def _month_key(day: date) -> str:
+    return day.strftime("%Y-%m")
 
 
 def get_or_create_user(tg_id: int) -> User:
+    user = _user_cache.get(tg_id)
+    if user is not None:
+        return user
     user = User.query.filter_by(telegram_id=tg_id).first()
     if not user:
         user = User(telegram_id=tg_id)
         db.session.add(user)
         db.session.commit()
         _init_categories(user)
+    _user_cache.set(tg_id, user)
     return user
 
 
@@ -32,106 +66,268 @@ def _init_categories(user: User) -> None:
     for name, ctype in defaults:
         db.session.add(Category(user_id=user.id, name=name, type=ctype))
     db.session.commit()
+    _category_cache.pop(user.id)
+
+
+def get_categories(user: User, ctype: Optional[CategoryType] = None) -> List[Category]:
+    cats = _category_cache.get(user.id)
+    if cats is None:
+        cats = Category.query.filter_by(user_id=user.id).order_by(Category.id).all()
+        _category_cache.set(user.id, cats)
+    if ctype is None:
+        return list(cats)
+    return [c for c in cats if c.type == ctype]
+
+
+def find_category(user: User, name: str, ctype: Optional[CategoryType] = None) -> Optional[Category]:
+    for cat in get_categories(user, ctype):
+        if cat.name == name:
+            return cat
+    return None
+
+
+def cache_stats() -> Dict[str, dict]:
+    return {"users": _user_cache.stats(), "categories": _category_cache.stats()}
+
+
+def add_category(user: User, name: str, ctype: CategoryType) -> bool:
+    # Без учёта регистра: быстрый ввод ищет категорию по name.lower(). Сравнение в
+    # Python, потому что lower() в SQLite не понимает кириллицу.
+    if any(c.name.lower() == name.lower() for c in get_categories(user)):
+        return False
+    db.session.add(Category(user_id=user.id, name=name, type=ctype))
+    db.session.commit()
+    _category_cache.pop(user.id)
+    return True
+
+
+def delete_category(user: User, name: str) -> bool:
+    cat = Category.query.filter_by(user_id=user.id, name=name).first()
+    if not cat:
+        return False
+    Transaction.query.filter_by(user_id=user.id, category_id=cat.id).update(
+        {Transaction.category_id: None}, synchronize_session=False
+    )
+    detach_category(user.id, cat.id)
+    Budget.query.filter_by(user_id=user.id, category_id=cat.id).delete(synchronize_session=False)
+    Category.query.filter_by(id=cat.id).delete(synchronize_session=False)
+    db.session.commit()
+    _category_cache.pop(user.id)
+    invalidate_user(user.id)
+    return True
+
+
+def set_user_currency(user: User, currency: str) -> User:
+    db.session.query(User).filter_by(id=user.id).update({User.currency: currency})
+    db.session.commit()
+    _user_cache.pop(user.telegram_id)
+    user.currency = currency
+    return user
 
 
 def create_transaction(user: User, amount: float, ctype: CategoryType, cat_name: str) -> Optional[Transaction]:
-    cat = Category.query.filter_by(user_id=user.id, name=cat_name, type=ctype).first()
+    cat = find_category(user, cat_name, ctype)
     if not cat:
         return None
     t = Transaction(
         user_id=user.id,
-        amount=amount,
+        amount=to_minor(amount),
         type=ctype,
-        category_id=cat.id
+        category_id=cat.id,
+        timestamp=datetime.utcnow()
     )
     db.session.add(t)
+    apply_transaction(user.id, t.timestamp, cat.id, ctype, t.amount)
+    # Без outbox (CLI, Flask без бота) уровень оповещения не трогаем: иначе check_budgets
+    # посчитает его отправленным. Такие оповещения досылает check_budgets.
+    alert = _update_budget_alert(user, cat) if ctype == CategoryType.expense and outbox.running else None
     db.session.commit()
+    invalidate_user(user.id)
+    if alert:
+        outbox.enqueue(user.telegram_id, alert)
     return t
 
 
-def get_balance(user: User) -> Tuple[float, float, float]:
-    now = datetime.now(timezone.utc)
-    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    inc = (
-            db.session.query(db.func.sum(Transaction.amount))
-            .filter_by(user_id=user.id, type=CategoryType.income)
-            .filter(Transaction.timestamp >= start)
-            .scalar() or 0.0
-    )
-    exp = (
-            db.session.query(db.func.sum(Transaction.amount))
-            .filter_by(user_id=user.id, type=CategoryType.expense)
-            .filter(Transaction.timestamp >= start)
-            .scalar() or 0.0
+_QUICK_ENTRY = re.compile(r"^\s*(\d+(?:[.,]\d{1,2})?)\s+(\S.*?)\s*$")
+
+
+def parse_quick_entries(text: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    entries, invalid = [], []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        match = _QUICK_ENTRY.match(line)
+        amount = match.group(1).replace(",", ".") if match else None
+        if amount is not None and to_minor(amount):
+            entries.append((amount, match.group(2)))
+        else:
+            invalid.append(line.strip())
+    return entries, invalid
+
+
+def create_transactions(user: User, entries: List[Tuple[str, str]]
+                        ) -> Tuple[List[Tuple[int, Category]], List[str], List[str]]:
+    # Тип берётся из категории: имена уникальны без учёта регистра (add_category).
+    # В старых данных могут быть «Еда» и «ЕДА» — такое имя не угадываем.
+    index, ambiguous_names = {}, set()
+    for c in get_categories(user):
+        if c.name.lower() in index:
+            ambiguous_names.add(c.name.lower())
+        index[c.name.lower()] = c
+    timestamp = datetime.utcnow()
+    saved, unknown, ambiguous, rows, totals = [], [], [], [], {}
+    for amount, name in entries:
+        if name.lower() in ambiguous_names:
+            ambiguous.append(name)
+            continue
+        cat = index.get(name.lower())
+        if cat is None:
+            unknown.append(name)
+            continue
+        minor = to_minor(amount)
+        rows.append({
+            "user_id": user.id,
+            "amount": minor,
+            "type": cat.type,
+            "category_id": cat.id,
+            "timestamp": timestamp,
+        })
+        total = totals.setdefault((cat.id, cat.type), [0, 0])
+        total[0] += minor
+        total[1] += 1
+        saved.append((minor, cat))
+    if not rows:
+        return saved, unknown, ambiguous
+    db.session.execute(db.insert(Transaction), rows)
+    apply_totals([
+        {"user_id": user.id, "day": timestamp.date(), "category_id": category_id, "type": ctype,
+         "total": amount, "count": count}
+        for (category_id, ctype), (amount, count) in totals.items()
+    ])
+    expense_cats = {cat.id: cat for _, cat in saved if cat.type == CategoryType.expense}
+    alerts = [_update_budget_alert(user, cat) for cat in expense_cats.values()] if outbox.running else []
+    db.session.commit()
+    invalidate_user(user.id)
+    for alert in filter(None, alerts):
+        outbox.enqueue(user.telegram_id, alert)
+    return saved, unknown, ambiguous
+
+
+def budget_alert_level(spent: int, limit: int) -> int:
+    if limit <= 0:
+        return 0
+    if spent >= limit:
+        return 100
+    if spent >= limit * BUDGET_ALERT_THRESHOLD:
+        return round(BUDGET_ALERT_THRESHOLD * 100)
+    return 0
+
+
+def budget_alert_text(name: str, spent: int, limit: int, currency: str) -> str:
+    pct = spent / limit * 100
+    return (
+        f"⚠️ Бюджет «{name}»: {format_minor(spent)}/{format_minor(limit)} "
+        f"{currency} ({pct:.0f}%)"
     )
-    return inc - exp, inc, exp
+
+
+def _update_budget_alert(user: User, cat: Category) -> Optional[str]:
+    budget = Budget.query.filter_by(user_id=user.id, category_id=cat.id).first()
+    if not budget or budget.amount <= 0:
+        return None
+    month = _month_key(_today())
+    spent = category_total(user.id, cat.id, _month_start())
+    level = budget_alert_level(spent, budget.amount)
+    notified = budget.alert_level if budget.alert_month == month else 0
+    if level <= notified:
+        return None
+    budget.alert_level = level
+    budget.alert_month = month
+    return budget_alert_text(cat.name, spent, budget.amount, user.currency)
+
+
+def get_balance(user: User) -> Tuple[float, float, float]:
+    inc, exp = totals_by_type(user.id, _month_start())
+    return from_minor(inc - exp), from_minor(inc), from_minor(exp)
+
+
+def get_daily_expenses(user: User) -> Tuple[float, Dict[str, float]]:
+    start = _today()
+    _, total = totals_by_type(user.id, start)
+    by_category = totals_by_category(user.id, start)
+    return from_minor(total), {name: from_minor(v) for name, v in by_category.items()}
 
 
 def get_balance_trend(user: User, days: int = 30) -> List[Tuple[datetime, float]]:
-    end = datetime.now(timezone.utc)
-    start_date = (end - timedelta(days=days - 1)).date()
-    daily_net: Dict[datetime.date, float] = {}
-    transactions = (
-        Transaction.query
-        .filter_by(user_id=user.id)
-        .filter(Transaction.timestamp >= datetime.combine(start_date, time.min, tzinfo=timezone.utc))
+    start_date = _today() - timedelta(days=days - 1)
+    points = balance_trend(user.id, start_date, _today() + timedelta(days=1))
+    return [(datetime.combine(day, time.min, tzinfo=timezone.utc), value) for day, value in points]
+
+
+def get_period_report(user: User, start: date, end: date) -> PeriodReport:
+    return period_report(user.id, start, end)
+
+
+def export_statement(user_id: int):
+    return (
+        db.select(
+            Transaction.id,
+            Transaction.amount,
+            Transaction.type,
+            Category.name,
+            Transaction.timestamp,
+        )
+        .outerjoin(Category, Category.id == Transaction.category_id)
+        .where(Transaction.user_id == user_id)
         .order_by(Transaction.timestamp)
-        .all()
     )
-    for txn in transactions:
-        d = txn.timestamp.date()
-        delta = txn.amount if txn.type == CategoryType.income else -txn.amount
-        daily_net[d] = daily_net.get(d, 0.0) + delta
-    trend: List[Tuple[datetime, float]] = []
-    cumulative = 0.0
-    for i in range(days):
-        current = start_date + timedelta(days=i)
-        cumulative += daily_net.get(current, 0.0)
-        trend.append((datetime.combine(current, time.min, tzinfo=timezone.utc), cumulative))
-    return trend
-
-
-def export_transactions_csv(user: User) -> io.BytesIO:
-    buffer = io.StringIO()
-    buffer.write(BOM)
-    writer = csv.writer(buffer, delimiter=';')
+
+
+def _export_chunks(user: User, chunk_size: int = EXPORT_CHUNK_SIZE):
+    stmt = export_statement(user.id).execution_options(yield_per=chunk_size)
+    return db.session.execute(stmt).partitions()
+
+
+def export_transactions_csv(user: User) -> BinaryIO:
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    text = io.TextIOWrapper(spool, encoding='utf-8', newline='', write_through=True)
+    text.write(BOM)
+    writer = csv.writer(text, delimiter=';')
     writer.writerow(["ID", "Сумма", "Тип", "Категория", "Дата/Время"])
-    rows = Transaction.query.filter_by(user_id=user.id).order_by(Transaction.timestamp).all()
-    for t in rows:
-        writer.writerow([
-            t.id,
-            f"{t.amount:.2f}",
-            t.type.value,
-            t.category.name,
-            t.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        ])
-    bio = io.BytesIO(buffer.getvalue().encode('utf-8'))
-    bio.name = 'transactions.csv'
-    bio.seek(0)
-    return bio
-
-
-def export_transactions_excel(user: User) -> io.BytesIO:
-    rows = Transaction.query.filter_by(user_id=user.id).order_by(Transaction.timestamp).all()
-    records = [
-        {
-            'ID': t.id,
-            'Сумма': t.amount,
-            'Тип': t.type.value,
-            'Категория': t.category.name,
-            'Дата/Время': t.timestamp
-        }
-        for t in rows
-    ]
-    df = pd.DataFrame(records)
-    df['Сумма'] = df['Сумма'].map(lambda x: f"{x:.2f}")
-    df['Дата/Время'] = pd.to_datetime(df['Дата/Время']).dt.strftime("%Y-%m-%d %H:%M:%S")
-    bio = io.BytesIO()
-    with pd.ExcelWriter(bio, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Transactions')
-    bio.name = 'transactions.xlsx'
-    bio.seek(0)
-    return bio
+    for chunk in _export_chunks(user):
+        writer.writerows(
+            (tid, format_minor(amount), ctype.value, name or "", ts.strftime("%Y-%m-%d %H:%M:%S"))
+            for tid, amount, ctype, name, ts in chunk
+        )
+    text.flush()
+    text.detach()
+    spool.seek(0)
+    return spool
+
+
+def export_transactions_excel(user: User) -> BinaryIO:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Transactions')
+    ws.append(["ID", "Сумма", "Тип", "Категория", "Дата/Время"])
+
+    # В write-only режиме строка сериализуется сразу при append, поэтому
+    # форматированные ячейки можно переиспользовать, не создавая стиль на каждую.
+    amount_cell = WriteOnlyCell(ws)
+    amount_cell.number_format = '0.00'
+    ts_cell = WriteOnlyCell(ws)
+    ts_cell.number_format = 'yyyy-mm-dd hh:mm:ss'
+    for chunk in _export_chunks(user):
+        for tid, amount, ctype, name, ts in chunk:
+            amount_cell.value = from_minor(amount)
+            ts_cell.value = ts
+            ws.append([tid, amount_cell, ctype.value, name or "", ts_cell])
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    wb.save(spool)
+    spool.seek(0)
+    return spool
 
 
 def set_budget(user: User, category_name: str, amount: float) -> bool:
@@ -144,40 +340,17 @@ def set_budget(user: User, category_name: str, amount: float) -> bool:
         return False
     budget = Budget.query.filter_by(user_id=user.id, category_id=cat.id).first()
     if budget:
-        budget.amount = amount
+        budget.amount = to_minor(amount)
+        budget.alert_level = 0
     else:
-        db.session.add(Budget(user_id=user.id, category_id=cat.id, amount=amount))
+        db.session.add(Budget(user_id=user.id, category_id=cat.id, amount=to_minor(amount)))
     db.session.commit()
     return True
 
 
 def get_category_spent(user: User, category_id: int) -> float:
-    now = datetime.now(timezone.utc)
-    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    spent = (
-            db.session.query(db.func.sum(Transaction.amount))
-            .filter_by(
-                user_id=user.id,
-                type=CategoryType.expense,
-                category_id=category_id
-            )
-            .filter(Transaction.timestamp >= start)
-            .scalar() or 0.0
-    )
-    return spent
+    return from_minor(category_total(user.id, category_id, _month_start()))
 
 
 def get_monthly_expenses_by_category(user: User) -> Dict[str, float]:
-    now = datetime.now(timezone.utc)
-    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    data: Dict[str, float] = {}
-    cats = Category.query.filter_by(user_id=user.id, type=CategoryType.expense).all()
-    for cat in cats:
-        total = (
-                db.session.query(db.func.sum(Transaction.amount))
-                .filter_by(user_id=user.id, type=CategoryType.expense, category_id=cat.id)
-                .filter(Transaction.timestamp >= start)
-                .scalar() or 0.0
-        )
-        data[cat.name] = total
-    return data
+    return {name: from_minor(v) for name, v in totals_by_category(user.id, _month_start()).items()}
@@ -0,0 +1,279 @@
+import csv
+import io
+import itertools
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import click
+
+from config import IMPORT_BATCH_SIZE
+from utils.cache import invalidate_user
+from utils.database import db
+from utils.helpers import add_category, get_categories, get_or_create_user
+from utils.models import CategoryType, Transaction, User
+from utils.money import to_minor
+from utils.rollups import apply_totals
+
+__all__ = ["ImportResult", "import_statement", "read_rows", "existing_transactions_statement", "register_commands"]
+
+# Заголовки собственного экспорта и типичных банковских выписок.
+COLUMNS = {
+    "timestamp": ("дата/время", "дата операции", "дата", "date", "datetime"),
+    "amount": ("сумма", "сумма операции", "сумма в валюте счёта", "amount"),
+    "category": ("категория", "category"),
+    "type": ("тип", "type"),
+}
+TYPES = {
+    "expense": CategoryType.expense,
+    "расход": CategoryType.expense,
+    "income": CategoryType.income,
+    "доход": CategoryType.income,
+}
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%Y-%m-%d", "%d.%m.%Y")
+UNCATEGORIZED = "Прочее"
+TYPE_SUFFIXES = {CategoryType.expense: "расход", CategoryType.income: "доход"}
+
+Key = Tuple[datetime, int, CategoryType]
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    categories_created: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        total = self.inserted + self.duplicates + self.invalid
+        return total / self.seconds if self.seconds else 0.0
+
+
+def read_rows(stream: BinaryIO, filename: str) -> Iterator[Sequence]:
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        # read_only читает лист потоково, не строя дерево ячеек всей книги.
+        wb = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    head = stream.read(4096)
+    stream.seek(0)
+    encoding = "utf-8-sig"
+    try:
+        head.decode(encoding)
+    except UnicodeDecodeError as exc:
+        # Обрезанный на границе буфера многобайтовый символ — не повод менять кодировку.
+        if exc.start < len(head) - 3:
+            encoding = "cp1251"
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    sample = head.decode(encoding, errors="ignore")
+    delimiter = ";" if sample.count(";") >= sample.count(",") else ","
+    try:
+        yield from csv.reader(text, delimiter=delimiter)
+    finally:
+        text.detach()
+
+
+def _column_map(header: Sequence) -> Dict[str, int]:
+    names = [str(cell or "").strip().lower() for cell in header]
+    mapping = {}
+    for field, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                mapping[field] = names.index(alias)
+                break
+    return mapping
+
+
+def _parse_amount(value) -> Optional[Decimal]:
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    cleaned = "".join(ch for ch in str(value or "") if ch.isdigit() or ch in "-+.,")
+    try:
+        return Decimal(cleaned.replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0, tzinfo=None)
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    text = str(value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_row(row: Sequence, columns: Dict[str, int]) -> Optional[Tuple[datetime, int, CategoryType, str]]:
+    def cell(field):
+        index = columns.get(field)
+        return row[index] if index is not None and index < len(row) else None
+
+    timestamp = _parse_timestamp(cell("timestamp"))
+    amount = _parse_amount(cell("amount"))
+    if timestamp is None or amount is None or amount == 0:
+        return None
+    ctype = TYPES.get(str(cell("type") or "").strip().lower())
+    if ctype is None:
+        # В выписках без столбца типа списания идут с минусом.
+        ctype = CategoryType.expense if amount < 0 else CategoryType.income
+    category = str(cell("category") or "").strip() or UNCATEGORIZED
+    return timestamp, to_minor(abs(amount)), ctype, category
+
+
+def existing_transactions_statement(user_id: int, first: date, last: date):
+    return db.select(Transaction.timestamp, Transaction.amount, Transaction.type).where(
+        Transaction.user_id == user_id,
+        Transaction.timestamp >= datetime.combine(first, datetime.min.time()),
+        Transaction.timestamp < datetime.combine(last + timedelta(days=1), datetime.min.time()),
+    )
+
+
+class _Deduplicator:
+    """Сверка с уже сохранёнными транзакциями пользователя по (время, сумма, тип).
+
+    Существующие строки загружаются по дням при первом обращении к дню, до вставки
+    в него, и каждая совпавшая строка файла «погашает» одну существующую. Поэтому
+    повторный импорт той же выписки ничего не добавляет, а две одинаковые покупки
+    в одном файле не считаются дублями друг друга.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.existing: Dict[date, Counter] = {}
+
+    def _load(self, days: List[date]) -> None:
+        for day in days:
+            self.existing[day] = Counter()
+        rows = db.session.execute(existing_transactions_statement(self.user_id, min(days), max(days)))
+        for timestamp, amount, ctype in rows:
+            counter = self.existing.get(timestamp.date())
+            if counter is not None:
+                counter[(timestamp.replace(microsecond=0), amount, ctype)] += 1
+
+    def is_duplicate(self, batch: List[Tuple]) -> List[bool]:
+        missing = sorted({row[0].date() for row in batch} - self.existing.keys())
+        if missing:
+            self._load(missing)
+        flags = []
+        for timestamp, amount, ctype, _ in batch:
+            counter = self.existing[timestamp.date()]
+            key: Key = (timestamp, amount, ctype)
+            if counter[key]:
+                counter[key] -= 1
+                flags.append(True)
+            else:
+                flags.append(False)
+        return flags
+
+
+def _category_ids(user: User) -> Dict[Tuple[str, CategoryType], int]:
+    return {(c.name.lower(), c.type): c.id for c in get_categories(user)}
+
+
+def _resolve_category(user: User, name: str, ctype: CategoryType, lookup: Dict,
+                      result: ImportResult) -> int:
+    # Имя может быть занято категорией другого типа: тогда строки попадают в
+    # «Имя (расход)» / «Имя (доход)», а не остаются без категории.
+    suffix = TYPE_SUFFIXES[ctype]
+    candidates = itertools.chain(
+        (name, f"{name} ({suffix})"), (f"{name} ({suffix} {n})" for n in itertools.count(2))
+    )
+    for candidate in candidates:
+        category_id = lookup.get((candidate.lower(), ctype))
+        if category_id is not None:
+            return category_id
+        if add_category(user, candidate, ctype):
+            result.categories_created += 1
+            lookup.update(_category_ids(user))
+            return lookup[(candidate.lower(), ctype)]
+
+
+def _write_batch(user: User, batch: List[Tuple], lookup: Dict, dedup: _Deduplicator,
+                 result: ImportResult) -> None:
+    missing = {(name.lower(), ctype): name for _, _, ctype, name in batch if (name.lower(), ctype) not in lookup}
+    for key, name in missing.items():
+        lookup[key] = _resolve_category(user, name, key[1], lookup, result)
+
+    rows, rollups = [], {}
+    for row, duplicate in zip(batch, dedup.is_duplicate(batch)):
+        if duplicate:
+            result.duplicates += 1
+            continue
+        timestamp, amount, ctype, name = row
+        category_id = lookup[(name.lower(), ctype)]
+        rows.append({
+            "user_id": user.id,
+            "amount": amount,
+            "type": ctype,
+            "category_id": category_id,
+            "timestamp": timestamp,
+        })
+        total = rollups.setdefault((timestamp.date(), category_id, ctype), [0, 0])
+        total[0] += amount
+        total[1] += 1
+    if rows:
+        db.session.execute(db.insert(Transaction), rows)
+        apply_totals([
+            {"user_id": user.id, "day": day, "category_id": category_id, "type": ctype, "total": amount, "count": count}
+            for (day, category_id, ctype), (amount, count) in rollups.items()
+        ])
+    db.session.commit()
+    result.inserted += len(rows)
+
+
+def import_statement(user: User, stream: BinaryIO, filename: str,
+                     batch_size: int = IMPORT_BATCH_SIZE) -> ImportResult:
+    started = time.perf_counter()
+    result = ImportResult()
+    rows = read_rows(stream, filename)
+    columns = _column_map(next(rows, ()))
+    if "timestamp" not in columns or "amount" not in columns:
+        raise ValueError("В файле нет столбцов с датой и суммой")
+    lookup = _category_ids(user)
+    dedup = _Deduplicator(user.id)
+    batch: List[Tuple] = []
+    for raw in rows:
+        parsed = _parse_row(raw, columns)
+        if parsed is None:
+            result.invalid += 1
+            continue
+        batch.append(parsed)
+        if len(batch) >= batch_size:
+            _write_batch(user, batch, lookup, dedup, result)
+            batch = []
+    if batch:
+        _write_batch(user, batch, lookup, dedup, result)
+    invalidate_user(user.id)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def register_commands(app) -> None:
+    @app.cli.command("import-statement")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--telegram-id", type=int, required=True)
+    @click.option("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    def import_statement_command(path, telegram_id, batch_size):
+        user = get_or_create_user(telegram_id)
+        with open(path, "rb") as stream:
+            result = import_statement(user, stream, path, batch_size)
+        click.echo(
+            f"Добавлено {result.inserted}, дублей {result.duplicates}, пропущено {result.invalid}, "
+            f"новых категорий {result.categories_created}: "
+            f"{result.seconds:.2f} с, {result.rows_per_second:.0f} строк/с"
+        )
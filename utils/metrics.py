@@ -0,0 +1,261 @@
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "Collected",
+    "Registry",
+    "registry",
+    "TaskMetrics",
+    "handler_metrics",
+    "job_metrics",
+    "telegram_requests",
+    "telegram_errors",
+    "rates_requests",
+    "sql_statements",
+    "install_sql_hook",
+]
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+Labels = Tuple[str, ...]
+Snapshot = Dict[str, Dict[Labels, List[float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0]
+            series[0] += amount
+
+    def snapshot(self) -> Dict[Labels, List[float]]:
+        with self._lock:
+            return {labels: list(values) for labels, values in self._series.items()}
+
+    def render(self, series: Dict[Labels, List[float]]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, labels)} {_number(values[0])}"
+                for labels, values in sorted(series.items())]
+
+
+class Histogram(Counter):
+    """Ведро хранит число наблюдений в своём интервале; накопительные значения
+    `le`, которые ждёт Prometheus, считаются только при выдаче."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = TIME_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [ведра..., +Inf, сумма, количество]
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, series: Dict[Labels, List[float]]) -> List[str]:
+        lines = []
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _format_labels(self.labels, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {_number(values[-1])}")
+        return lines
+
+
+class Collected(Counter):
+    """Значения читаются из функции при каждом снимке: для счётчиков, которые объект
+    уже ведёт сам (кэши, outbox), и для текущих размеров."""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str],
+                 collect: Callable[[], Dict[Labels, float]], kind: str = "counter"):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self._collect = collect
+
+    def snapshot(self) -> Dict[Labels, List[float]]:
+        return {labels: [value] for labels, value in self._collect().items()}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Counter] = {}
+        self._remote: Dict[Hashable, Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = TIME_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def collect(self, name: str, documentation: str, labels: Sequence[str],
+                func: Callable[[], Dict[Labels, float]], kind: str = "counter") -> Collected:
+        return self._register(Collected(name, documentation, labels, func, kind))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Snapshot:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def absorb(self, source: Hashable, snapshot: Snapshot) -> None:
+        # Снимки накопительные, поэтому от каждого источника хранится только последний.
+        with self._lock:
+            self._remote[source] = snapshot
+
+    def render(self) -> str:
+        with self._lock:
+            remote = list(self._remote.values())
+        lines = []
+        for name, metric in self.metrics.items():
+            series = metric.snapshot()
+            for snapshot in remote:
+                for labels, values in snapshot.get(name, {}).items():
+                    own = series.setdefault(labels, [0] * len(values))
+                    for i, value in enumerate(values):
+                        own[i] += value
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(series))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+sql_statements = registry.counter("finhelper_sql_statements_total", "SQL-запросы, отправленные в базу")
+telegram_requests = registry.histogram(
+    "finhelper_telegram_request_seconds", "Запросы к Bot API", ("method",))
+telegram_errors = registry.counter(
+    "finhelper_telegram_errors_total", "Запросы к Bot API с ошибкой или кодом >= 400", ("method",))
+rates_requests = registry.histogram(
+    "finhelper_rates_request_seconds", "Запросы к провайдерам курсов", ("provider", "outcome"))
+
+
+def _cache_lookups() -> Dict[Labels, float]:
+    from utils.cache import named_caches
+
+    values = {}
+    for name, cache in named_caches.items():
+        values[(name, "hit")] = cache.hits
+        values[(name, "miss")] = cache.misses
+    return values
+
+
+def _cache_entries() -> Dict[Labels, float]:
+    from utils.cache import named_caches
+
+    return {(name,): len(cache) for name, cache in named_caches.items()}
+
+
+registry.collect("finhelper_cache_lookups_total", "Обращения к кэшам в памяти", ("cache", "result"), _cache_lookups)
+registry.collect("finhelper_cache_entries", "Записей в кэшах в памяти", ("cache",), _cache_entries, kind="gauge")
+
+# Счётчик SQL-запросов текущего обработчика или задачи. run_db копирует контекст
+# в поток пула, поэтому запросы из потока попадают в счётчик вызвавшего обработчика.
+_scope: ContextVar[Optional[List[int]]] = ContextVar("metrics_scope", default=None)
+
+
+def install_sql_hook(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        sql_statements.inc()
+        scope = _scope.get()
+        if scope is not None:
+            scope[0] += 1
+
+
+class TaskMetrics:
+    def __init__(self, prefix: str, label: str):
+        self.seconds = registry.histogram(f"{prefix}_seconds", "Время выполнения", (label,))
+        self.queries = registry.histogram(
+            f"{prefix}_sql_statements", "SQL-запросов за один вызов", (label,), QUERY_BUCKETS)
+        self.errors = registry.counter(f"{prefix}_errors_total", "Вызовы, завершившиеся исключением", (label,))
+
+    @contextmanager
+    def track(self, name: str):
+        parent = _scope.get()
+        scope = [0]
+        token = _scope.set(scope)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors.inc(name)
+            raise
+        finally:
+            self.seconds.observe(time.perf_counter() - started, name)
+            self.queries.observe(scope[0], name)
+            _scope.reset(token)
+            if parent is not None:
+                parent[0] += scope[0]
+
+    def wrap(self, func: Callable, name: Optional[str] = None) -> Callable:
+        name = name or getattr(func, "__name__", repr(func))
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self.track(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.track(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+handler_metrics = TaskMetrics("finhelper_handler", "handler")
+job_metrics = TaskMetrics("finhelper_job", "job")
+
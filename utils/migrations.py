@@ -0,0 +1,321 @@
+import logging
+from contextlib import contextmanager
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+import click
+from sqlalchemy import Connection, Engine, MetaData, text
+
+from config import MIGRATION_LOCK_TIMEOUT_MS
+from utils.database import count_queries, db
+from utils.aggregates import category_total, daily_net, totals_by_category, totals_by_type
+from utils.analytics import load_columns
+from utils.helpers import export_statement
+from utils.importer import existing_transactions_statement
+from utils.models import Category
+from utils.money import MINOR_UNITS
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "MIGRATIONS",
+    "LATEST_VERSION",
+    "apply_migrations",
+    "init_schema",
+    "explain_hot_queries",
+    "is_full_scan",
+    "register_commands",
+]
+
+
+def _create_hot_indexes(conn: Connection) -> None:
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_timestamp '
+        'ON "transaction" (user_id, timestamp)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_category_timestamp '
+        'ON "transaction" (user_id, type, category_id, timestamp)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_category_user_name_type '
+        'ON category (user_id, name, type)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_budget_user_category '
+        'ON budget (user_id, category_id)'
+    ))
+
+
+def _backfill_daily_rollup(conn: Connection) -> None:
+    # Базы, созданные до появления daily_rollup, получают таблицу пустой, а базы
+    # старше миграций — не получают вовсе: create_all для них не запускается.
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS daily_rollup ('
+        'id INTEGER NOT NULL, user_id INTEGER NOT NULL, day DATE NOT NULL, category_id INTEGER, '
+        'type VARCHAR(7) NOT NULL, total FLOAT NOT NULL, count INTEGER NOT NULL, '
+        'PRIMARY KEY (id), '
+        'CONSTRAINT uq_daily_rollup_key UNIQUE (user_id, day, category_id, type), '
+        'FOREIGN KEY(user_id) REFERENCES user (id), '
+        'FOREIGN KEY(category_id) REFERENCES category (id))'
+    ))
+    conn.execute(text(
+        'INSERT INTO daily_rollup (user_id, day, category_id, type, total, count) '
+        'SELECT user_id, date(timestamp), category_id, type, SUM(amount), COUNT(id) '
+        'FROM "transaction" '
+        'WHERE NOT EXISTS (SELECT 1 FROM daily_rollup) '
+        'GROUP BY user_id, date(timestamp), category_id, type'
+    ))
+
+
+def _create_rollup_day_index(conn: Connection) -> None:
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_daily_rollup_day_type '
+        'ON daily_rollup (day, type)'
+    ))
+
+
+def _add_budget_alert_state(conn: Connection) -> None:
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(budget)")}
+    if "alert_level" not in columns:
+        conn.execute(text("ALTER TABLE budget ADD COLUMN alert_level INTEGER NOT NULL DEFAULT 0"))
+    if "alert_month" not in columns:
+        conn.execute(text("ALTER TABLE budget ADD COLUMN alert_month VARCHAR(7)"))
+
+
+# DDL таблиц на момент миграции 5. Модели в utils.models меняются дальше, а
+# миграция должна всегда создавать одно и то же, поэтому схема здесь зафиксирована.
+_V5_TABLES = {
+    "transaction": (
+        'CREATE TABLE "transaction" ('
+        'id INTEGER NOT NULL, user_id INTEGER NOT NULL, amount INTEGER NOT NULL, '
+        'type VARCHAR(7) NOT NULL, category_id INTEGER, timestamp DATETIME, '
+        'PRIMARY KEY (id), '
+        'FOREIGN KEY(user_id) REFERENCES user (id), '
+        'FOREIGN KEY(category_id) REFERENCES category (id))',
+        'CREATE INDEX ix_transaction_user_timestamp ON "transaction" (user_id, timestamp)',
+        'CREATE INDEX ix_transaction_user_type_category_timestamp '
+        'ON "transaction" (user_id, type, category_id, timestamp)',
+    ),
+    "budget": (
+        'CREATE TABLE budget ('
+        'id INTEGER NOT NULL, user_id INTEGER NOT NULL, category_id INTEGER NOT NULL, '
+        'amount INTEGER NOT NULL, alert_level INTEGER DEFAULT \'0\' NOT NULL, alert_month VARCHAR(7), '
+        'PRIMARY KEY (id), '
+        'FOREIGN KEY(user_id) REFERENCES user (id), '
+        'FOREIGN KEY(category_id) REFERENCES category (id))',
+        'CREATE INDEX ix_budget_user_category ON budget (user_id, category_id)',
+    ),
+    "daily_rollup": (
+        'CREATE TABLE daily_rollup ('
+        'id INTEGER NOT NULL, user_id INTEGER NOT NULL, day DATE NOT NULL, category_id INTEGER, '
+        'type VARCHAR(7) NOT NULL, total INTEGER NOT NULL, count INTEGER NOT NULL, '
+        'PRIMARY KEY (id), '
+        'CONSTRAINT uq_daily_rollup_key UNIQUE (user_id, day, category_id, type), '
+        'FOREIGN KEY(user_id) REFERENCES user (id), '
+        'FOREIGN KEY(category_id) REFERENCES category (id))',
+        'CREATE INDEX ix_daily_rollup_day_type ON daily_rollup (day, type)',
+    ),
+}
+
+
+def _column_type(conn: Connection, table: str, column: str) -> str:
+    for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")'):
+        if row[1] == column:
+            return row[2].upper()
+    return ""
+
+
+def _recreate_table(conn: Connection, name: str, ddl: Tuple[str, ...], scaled: Tuple[str, ...],
+                    copy: bool = True) -> None:
+    # SQLite не меняет тип столбца через ALTER, а в столбце FLOAT целые читаются
+    # как REAL, поэтому таблица пересоздаётся.
+    for index in conn.exec_driver_sql(f'PRAGMA index_list("{name}")').fetchall():
+        if index[3] == "c":
+            conn.exec_driver_sql(f'DROP INDEX "{index[1]}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{name}" RENAME TO "{name}_old"')
+    for statement in ddl:
+        conn.exec_driver_sql(statement)
+    if copy:
+        old = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{name}_old")')}
+        columns = [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{name}")') if row[1] in old]
+        select = ", ".join(
+            f'CAST(ROUND("{c}" * {MINOR_UNITS}) AS INTEGER)' if c in scaled else f'"{c}"' for c in columns
+        )
+        target = ", ".join(f'"{c}"' for c in columns)
+        conn.exec_driver_sql(f'INSERT INTO "{name}" ({target}) SELECT {select} FROM "{name}_old"')
+    conn.exec_driver_sql(f'DROP TABLE "{name}_old"')
+
+
+def _amounts_to_minor_units(conn: Connection) -> None:
+    # Масштабируются только столбцы, которые ещё REAL: повторный запуск ничего не умножает.
+    converted = False
+    for name, column in (("transaction", "amount"), ("budget", "amount")):
+        if _column_type(conn, name, column) != "INTEGER":
+            _recreate_table(conn, name, _V5_TABLES[name], (column,))
+            converted = True
+    if _column_type(conn, "daily_rollup", "total") != "INTEGER":
+        _recreate_table(conn, "daily_rollup", _V5_TABLES["daily_rollup"], ("total",), copy=False)
+        converted = True
+    if not converted:
+        return
+    # Сводка пересчитывается из уже целых сумм: округлять накопленные float-суммы нельзя.
+    _refill_daily_rollup(conn)
+
+
+def _refill_daily_rollup(conn: Connection) -> None:
+    conn.execute(text('DELETE FROM daily_rollup'))
+    conn.execute(text(
+        'INSERT INTO daily_rollup (user_id, day, category_id, type, total, count) '
+        'SELECT user_id, date(timestamp), category_id, type, SUM(amount), COUNT(id) '
+        'FROM "transaction" '
+        'GROUP BY user_id, date(timestamp), category_id, type'
+    ))
+
+
+_V6_DAILY_ROLLUP = (
+    'CREATE TABLE daily_rollup ('
+    'id INTEGER NOT NULL, user_id INTEGER NOT NULL, day DATE NOT NULL, category_id INTEGER, '
+    'type VARCHAR(7) NOT NULL, total INTEGER NOT NULL, count INTEGER NOT NULL, '
+    'PRIMARY KEY (id), '
+    'FOREIGN KEY(user_id) REFERENCES user (id), '
+    'FOREIGN KEY(category_id) REFERENCES category (id))',
+    'CREATE INDEX ix_daily_rollup_day_type ON daily_rollup (day, type)',
+    'CREATE UNIQUE INDEX uq_daily_rollup_key ON daily_rollup (user_id, day, coalesce(category_id, 0), type)',
+)
+
+
+def _rollup_key_without_nulls(conn: Connection) -> None:
+    # Ограничение UNIQUE по nullable category_id не сливало строки без категории:
+    # у каждой записи появлялась своя строка сводки. Таблица пересоздаётся с
+    # уникальным индексом по COALESCE(category_id, 0) и пересчитывается.
+    _recreate_table(conn, "daily_rollup", _V6_DAILY_ROLLUP, (), copy=False)
+    _refill_daily_rollup(conn)
+
+
+def _drop_unused_transaction_index(conn: Connection) -> None:
+    # Отчёты и бюджеты читают daily_rollup, а выборки по транзакциям (экспорт, импорт)
+    # идут по ix_transaction_user_timestamp. Индекс только замедлял каждую вставку.
+    conn.execute(text('DROP INDEX IF EXISTS ix_transaction_user_type_category_timestamp'))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "composite indexes for transaction/category/budget lookups", _create_hot_indexes),
+    (2, "backfill daily_rollup from transactions", _backfill_daily_rollup),
+    (3, "daily_rollup index for all-user jobs", _create_rollup_day_index),
+    (4, "budget alert state", _add_budget_alert_state),
+    (5, "integer minor units for amounts and rollup totals", _amounts_to_minor_units),
+    (6, "daily_rollup key treats a missing category as one value", _rollup_key_without_nulls),
+    (7, "drop the transaction index no query uses", _drop_unused_transaction_index),
+]
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+@contextmanager
+def _write_lock(engine: Engine, timeout_ms: int = MIGRATION_LOCK_TIMEOUT_MS):
+    # pysqlite не открывает транзакцию перед DDL, поэтому она открывается явно.
+    # BEGIN IMMEDIATE сразу берёт блокировку записи: процессы, стартующие
+    # одновременно (воркеры, несколько копий бота), выполняют шаги по очереди.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        busy_timeout = conn.exec_driver_sql("PRAGMA busy_timeout").scalar()
+        conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(timeout_ms)}")
+        try:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+        finally:
+            conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+
+
+def _user_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def apply_migrations(engine: Engine) -> int:
+    current = 0
+    for version, description, migrate in MIGRATIONS:
+        # Каждый шаг — отдельная транзакция вместе с user_version; версия перечитывается
+        # под блокировкой, так что шаг, уже выполненный другим процессом, пропускается.
+        with _write_lock(engine) as conn:
+            current = _user_version(conn)
+            if version <= current:
+                continue
+            logger.info("Миграция БД %s: %s", version, description)
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+            current = version
+    return current
+
+
+def init_schema(engine: Engine, metadata: MetaData) -> int:
+    with _write_lock(engine) as conn:
+        fresh = _user_version(conn) == 0 and not conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).first()
+        if fresh:
+            # Новая база сразу создаётся по текущим моделям: миграции ей не нужны.
+            metadata.create_all(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(LATEST_VERSION)}")
+            return LATEST_VERSION
+    version = apply_migrations(engine)
+    # Таблицы, появившиеся без миграции (bot_state), создаются после всех шагов.
+    with _write_lock(engine) as conn:
+        metadata.create_all(conn)
+    return version
+
+
+def _hot_queries() -> Dict[str, Callable[[], object]]:
+    # Проверяются сами функции и построители запросов, которые вызывают обработчики,
+    # а не копии их SQL: если запрос начнёт читать другую таблицу, проверка увидит это сама.
+    user_id = 1
+    since, today = date(2000, 1, 1), date.today()
+    return {
+        "balance: totals by type since date": lambda: totals_by_type(user_id, since),
+        "stats: totals by category since date": lambda: totals_by_category(user_id, since),
+        "budget: category spend since date": lambda: category_total(user_id, 1, since),
+        "trend: daily net since date": lambda: daily_net(user_id, since),
+        "analytics: rollup columns for period": lambda: load_columns(user_id, since, today),
+        "export: transactions by user ordered by time":
+            lambda: db.session.execute(export_statement(user_id)).first(),
+        "import: existing transactions by day":
+            lambda: db.session.execute(existing_transactions_statement(user_id, today, today)).all(),
+        "categories of user": lambda: Category.query.filter_by(user_id=user_id).order_by(Category.id).all(),
+    }
+
+
+def is_full_scan(step: str) -> bool:
+    return step.startswith("SCAN") and "INDEX" not in step
+
+
+def explain_hot_queries() -> List[Tuple[str, List[str]]]:
+    conn = db.session.connection()
+    report = []
+    for name, run in _hot_queries().items():
+        with count_queries(with_parameters=True) as statements:
+            run()
+        plan = []
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan.extend(row[-1] for row in rows)
+        report.append((name, plan))
+    return report
+
+
+def register_commands(app) -> None:
+    @app.cli.command("db-explain")
+    def db_explain():
+        failed = False
+        for name, plan in explain_hot_queries():
+            click.echo(name)
+            for step in plan:
+                full_scan = is_full_scan(step)
+                failed |= full_scan
+                click.echo(f"    {step}{'  <-- полный просмотр' if full_scan else ''}")
+        if failed:
+            raise SystemExit(1)
@@ -26,23 +26,59 @@ class Category(db.Model):
     user = db.relationship("User", back_populates="categories")
     transactions = db.relationship("Transaction", back_populates="category", lazy="dynamic")
     budgets = db.relationship("Budget", back_populates="category", lazy="dynamic")
+    __table_args__ = (
+        db.Index("ix_category_user_name_type", "user_id", "name", "type"),
+    )
 
 
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
     type = db.Column(db.Enum(CategoryType), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey("category.id"))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship("User", back_populates="transactions")
     category = db.relationship("Category", back_populates="transactions")
+    __table_args__ = (
+        db.Index("ix_transaction_user_timestamp", "user_id", "timestamp"),
+    )
 
 
 class Budget(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+    alert_level = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    alert_month = db.Column(db.String(7))
     user = db.relationship("User", back_populates="budgets")
     category = db.relationship("Category", back_populates="budgets")
+    __table_args__ = (
+        db.Index("ix_budget_user_category", "user_id", "category_id"),
+    )
+
+
+class DailyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"))
+    type = db.Column(db.Enum(CategoryType), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (
+        # SQLite считает NULL-ы различными, поэтому «без категории» в ключе сводки — это 0.
+        db.Index(
+            "uq_daily_rollup_key", "user_id", "day", db.func.coalesce(category_id, db.literal_column("0")), "type",
+            unique=True,
+        ),
+        db.Index("ix_daily_rollup_day_type", "day", "type"),
+    )
+
+
+class BotState(db.Model):
+    kind = db.Column(db.String(64), primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,25 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+__all__ = ["MINOR_UNITS", "to_minor", "from_minor", "format_minor"]
+
+# Суммы в БД хранятся целым числом копеек/центов; все поддерживаемые валюты — с двумя знаками.
+MINOR_UNITS = 100
+
+_CENT = Decimal("0.01")
+
+
+def to_minor(value: Union[int, float, str, Decimal]) -> int:
+    # float идёт через str, чтобы 0.1 превратилось в 10, а не в 10.000000000000000555.
+    amount = value if isinstance(value, Decimal) else Decimal(str(value).replace(",", "."))
+    return int(amount.quantize(_CENT, rounding=ROUND_HALF_UP) * MINOR_UNITS)
+
+
+def from_minor(minor: int) -> float:
+    return minor / MINOR_UNITS
+
+
+def format_minor(minor: int) -> str:
+    sign = "-" if minor < 0 else ""
+    major, cents = divmod(abs(int(minor)), MINOR_UNITS)
+    return f"{sign}{major}.{cents:02d}"
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Deque, Dict, Optional
+
+from telegram.error import Forbidden, BadRequest, NetworkError, RetryAfter, TimedOut
+
+from config import OUTBOX_MAX_RETRIES, OUTBOX_PER_CHAT_INTERVAL, OUTBOX_RATE, OUTBOX_WORKERS
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+dead_letter_logger = logging.getLogger(f"{__name__}.dead_letter")
+
+__all__ = ["TokenBucket", "OutgoingMessage", "Outbox", "outbox"]
+
+outbox_messages = registry.counter(
+    "finhelper_outbox_messages_total", "Рассылки через outbox: sent, retried, dead_letter", ("outcome",))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def drain(self) -> None:
+        self._tokens = 0
+        self._updated = time.monotonic()
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    kwargs: dict = field(default_factory=dict)
+    attempts: int = 0
+
+
+class Outbox:
+    def __init__(self, rate: float = OUTBOX_RATE, per_chat_interval: float = OUTBOX_PER_CHAT_INTERVAL,
+                 workers: int = OUTBOX_WORKERS, max_retries: int = OUTBOX_MAX_RETRIES):
+        self.rate = rate
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bot = None
+        self.sent = 0
+        self.retried = 0
+        self.dead_letters: Deque[OutgoingMessage] = deque(maxlen=1000)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._bucket: Optional[TokenBucket] = None
+        self._next_for_chat: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    async def start(self, bot) -> None:
+        self.bot = bot
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._bucket = TokenBucket(self.rate)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"outbox-{i}") for i in range(self.workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        if drain and self._queue is not None:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def enqueue(self, chat_id: int, text: str, **kwargs) -> None:
+        # Можно вызывать из любого потока, например из заданий APScheduler.
+        if self._loop is None:
+            raise RuntimeError("Outbox не запущен")
+        message = OutgoingMessage(chat_id, text, kwargs)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(message)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+
+    async def _wait_turn(self, chat_id: int) -> None:
+        now = time.monotonic()
+        ready_at = max(self._next_for_chat.get(chat_id, 0.0), self._paused_until)
+        self._next_for_chat[chat_id] = max(ready_at, now) + self.per_chat_interval
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
+        while self._paused_until > time.monotonic():
+            await asyncio.sleep(self._paused_until - time.monotonic())
+        await self._bucket.acquire()
+
+    async def _worker(self) -> None:
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: OutgoingMessage) -> None:
+        await self._wait_turn(message.chat_id)
+        try:
+            await self.bot.send_message(chat_id=message.chat_id, text=message.text, **message.kwargs)
+            self.sent += 1
+            outbox_messages.inc("sent")
+            if len(self._next_for_chat) > 10 * self.workers:
+                self._forget_idle_chats()
+        except RetryAfter as exc:
+            delay = exc.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            # 429 относится ко всему боту: останавливаем все воркеры, а не только этот.
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._bucket.drain()
+            self._retry(message, exc)
+        except (Forbidden, BadRequest) as exc:
+            self._dead_letter(message, exc)
+        except (TimedOut, NetworkError) as exc:
+            self._retry(message, exc)
+        except Exception as exc:
+            self._dead_letter(message, exc)
+
+    def _retry(self, message: OutgoingMessage, exc: Exception) -> None:
+        message.attempts += 1
+        if message.attempts > self.max_retries:
+            self._dead_letter(message, exc)
+            return
+        self.retried += 1
+        outbox_messages.inc("retried")
+        self._queue.put_nowait(message)
+
+    def _dead_letter(self, message: OutgoingMessage, exc: Exception) -> None:
+        self.dead_letters.append(message)
+        outbox_messages.inc("dead_letter")
+        dead_letter_logger.warning(
+            "Сообщение для chat_id=%s не доставлено после %s попыток: %s",
+            message.chat_id, message.attempts + 1, exc,
+        )
+
+    def _forget_idle_chats(self) -> None:
+        now = time.monotonic()
+        self._next_for_chat = {chat: at for chat, at in self._next_for_chat.items() if at > now}
+
+
+outbox = Outbox()
+registry.collect(
+    "finhelper_outbox_queue_size", "Сообщений в очереди outbox", (),
+    lambda: {(): outbox._queue.qsize() if outbox._queue is not None else 0}, kind="gauge",
+)
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    CURRENCY_API_URL,
+    CURRENCY_FALLBACK_API_URL,
+    RATES_CACHE_SIZE,
+    RATES_HEDGE_DELAY,
+    RATES_STALE_TTL,
+    RATES_TIMEOUT,
+    RATES_TTL,
+    SUPPORTED_CURRENCIES,
+)
+from utils.cache import TTLCache
+from utils.metrics import rates_requests
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "RateProvider",
+    "OpenErApiProvider",
+    "HedgedFetcher",
+    "default_fetcher",
+    "RatesService",
+    "rates_service",
+]
+
+
+class RateProvider:
+    date_field = "date"
+
+    def __init__(self, name: str, url: str, timeout: float = RATES_TIMEOUT, alpha: float = 0.2):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.alpha = alpha
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=8))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=8))
+        self.calls = 0
+        self.failures = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self._lock = threading.Lock()
+
+    def url_for(self, base: str) -> str:
+        return f"{self.url}?base={base}"
+
+    def fetch(self, base: str) -> dict:
+        started = time.perf_counter()
+        try:
+            resp = self.session.get(self.url_for(base), timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            rates = data.get("rates") or {}
+            if not rates:
+                raise ValueError(f"{self.name}: пустой ответ для {base}")
+        except Exception:
+            self._record(time.perf_counter() - started, ok=False)
+            raise
+        self._record(time.perf_counter() - started, ok=True)
+        return {"base": base, "date": data.get(self.date_field), "rates": rates}
+
+    def _record(self, elapsed: float, ok: bool) -> None:
+        rates_requests.observe(elapsed, self.name, "ok" if ok else "error")
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            # Ошибка считается как запрос длиной в таймаут, чтобы нестабильный
+            # провайдер опускался в очереди так же, как медленный.
+            sample = elapsed if ok else max(elapsed, self.timeout)
+            self.latency = sample if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * sample
+            self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha * (0.0 if ok else 1.0)
+
+    @property
+    def score(self) -> float:
+        return (self.latency or 0.0) * (1 + 4 * self.error_rate)
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "latency_ewma": self.latency,
+            "error_rate_ewma": self.error_rate,
+        }
+
+
+class OpenErApiProvider(RateProvider):
+    date_field = "time_last_update_utc"
+
+    def url_for(self, base: str) -> str:
+        return f"{self.url}/{base}"
+
+
+class HedgedFetcher:
+    def __init__(self, providers: List[RateProvider], hedge_delay: float = RATES_HEDGE_DELAY):
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(providers), thread_name_prefix="rates")
+
+    def ranked(self) -> List[RateProvider]:
+        # Провайдеры без статистики идут первыми в исходном порядке.
+        return sorted(self.providers, key=lambda p: (p.latency is not None, p.score))
+
+    def __call__(self, base: str) -> dict:
+        queue = self.ranked()
+        pending = set()
+        while queue or pending:
+            if queue:
+                pending.add(self._executor.submit(queue.pop(0).fetch, base))
+            timeout = self.hedge_delay if queue else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                logger.warning("Провайдер курсов не ответил: %s", future.exception())
+        return {"base": base, "date": None, "rates": {}}
+
+    def stats(self) -> List[dict]:
+        return [p.stats() for p in self.ranked()]
+
+
+default_fetcher = HedgedFetcher([
+    RateProvider("exchangerate.host", CURRENCY_API_URL),
+    OpenErApiProvider("open.er-api.com", CURRENCY_FALLBACK_API_URL),
+])
+
+
+class RatesService:
+    def __init__(self, fetch: Callable[[str], dict] = default_fetcher,
+                 ttl: float = RATES_TTL, stale_ttl: float = RATES_STALE_TTL,
+                 cache_size: int = RATES_CACHE_SIZE):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # base -> (время получения, ответ); срок жизни проверяет сам сервис.
+        self._entries = TTLCache(maxsize=cache_size)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, base: str) -> dict:
+        base = base.upper()
+        entry = self._entries.get(base)
+        if entry:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                return entry[1]
+            if age < self.stale_ttl:
+                self._refresh_in_background(base)
+                return entry[1]
+        return self.refresh(base)
+
+    async def aget(self, base: str) -> dict:
+        # Из кеша (в том числе устаревшего) отвечаем прямо в event loop,
+        # в поток уходит только запрос к провайдерам.
+        entry = self._entries.get(base.upper())
+        if entry and time.monotonic() - entry[0] < self.stale_ttl:
+            return self.get(base)
+        return await asyncio.to_thread(self.get, base)
+
+    def peek(self, base: str) -> Optional[dict]:
+        entry = self._entries.get(base.upper())
+        return entry[1] if entry else None
+
+    @staticmethod
+    def select(data: dict, symbols: Iterable[str]) -> dict:
+        rates = data.get("rates") or {}
+        return {
+            "base": data.get("base"),
+            "date": data.get("date"),
+            "rates": {cur: rates[cur] for cur in symbols if cur in rates},
+        }
+
+    def quote(self, base: str, symbols: Iterable[str] = SUPPORTED_CURRENCIES) -> dict:
+        return self.select(self.get(base), symbols)
+
+    async def aquote(self, base: str, symbols: Iterable[str] = SUPPORTED_CURRENCIES) -> dict:
+        return self.select(await self.aget(base), symbols)
+
+    def refresh(self, base: str) -> dict:
+        base = base.upper()
+        data = self.fetch(base)
+        if data.get("rates"):
+            self._entries.set(base, (time.monotonic(), data))
+            return data
+        entry = self._entries.get(base)
+        return entry[1] if entry else data
+
+    def refresh_all(self, bases: Iterable[str] = SUPPORTED_CURRENCIES) -> None:
+        for base in bases:
+            try:
+                self.refresh(base)
+            except Exception:
+                logger.exception("Не удалось обновить курсы для %s", base)
+
+    def _refresh_in_background(self, base: str) -> None:
+        with self._lock:
+            if base in self._refreshing:
+                return
+            self._refreshing.add(base)
+
+        def _run():
+            try:
+                self.refresh(base)
+            except Exception:
+                logger.exception("Не удалось обновить курсы для %s", base)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(base)
+
+        threading.Thread(target=_run, name=f"rates-{base}", daemon=True).start()
+
+
+rates_service = RatesService()
@@ -0,0 +1,143 @@
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+import click
+from sqlalchemy.dialects.sqlite import insert
+
+from utils.database import db
+from utils.models import CategoryType, DailyRollup, Transaction
+
+__all__ = ["apply_transaction", "apply_totals", "detach_category", "rebuild", "check", "register_commands"]
+
+
+def _upsert():
+    stmt = insert(DailyRollup)
+    return stmt.on_conflict_do_update(
+        # Цель конфликта повторяет уникальный индекс uq_daily_rollup_key, включая COALESCE.
+        index_elements=[
+            DailyRollup.user_id,
+            DailyRollup.day,
+            db.func.coalesce(DailyRollup.category_id, db.literal_column("0")),
+            DailyRollup.type,
+        ],
+        set_={
+            "total": DailyRollup.total + stmt.excluded.total,
+            "count": DailyRollup.count + stmt.excluded.count,
+        },
+    )
+
+
+_UPSERT = _upsert()
+
+
+def apply_transaction(user_id: int, timestamp: datetime, category_id: Optional[int],
+                      ctype: CategoryType, amount: int, count: int = 1) -> None:
+    # Выполняется в текущей сессии до commit, поэтому строка транзакции
+    # и её сводка фиксируются атомарно.
+    apply_totals([{
+        "user_id": user_id,
+        "day": timestamp.date(),
+        "category_id": category_id,
+        "type": ctype,
+        "total": amount,
+        "count": count,
+    }])
+
+
+def apply_totals(rows: List[dict]) -> None:
+    # Один executemany на пачку строк сводки (импорт, быстрый ввод).
+    if rows:
+        db.session.execute(_UPSERT, rows)
+
+
+def detach_category(user_id: int, category_id: int) -> None:
+    # Транзакции удалённой категории остаются без категории, поэтому их сводки
+    # переносятся в «пустую» категорию с тем же днём и типом.
+    rows = DailyRollup.query.filter_by(user_id=user_id, category_id=category_id).all()
+    for row in rows:
+        orphan = DailyRollup.query.filter_by(
+            user_id=user_id, day=row.day, category_id=None, type=row.type
+        ).first()
+        if orphan:
+            orphan.total += row.total
+            orphan.count += row.count
+            db.session.delete(row)
+        else:
+            row.category_id = None
+    db.session.flush()
+
+
+def _raw_totals(user_id: Optional[int] = None):
+    day = db.func.date(Transaction.timestamp)
+    query = db.session.query(
+        Transaction.user_id,
+        day.label("day"),
+        Transaction.category_id,
+        Transaction.type,
+        db.func.sum(Transaction.amount),
+        db.func.count(Transaction.id),
+    )
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    return query.group_by(Transaction.user_id, day, Transaction.category_id, Transaction.type)
+
+
+def rebuild(user_id: Optional[int] = None) -> int:
+    delete = DailyRollup.query
+    if user_id is not None:
+        delete = delete.filter_by(user_id=user_id)
+    delete.delete(synchronize_session=False)
+    rows = [
+        {
+            "user_id": uid,
+            "day": date.fromisoformat(day),
+            "category_id": category_id,
+            "type": ctype,
+            "total": total,
+            "count": count,
+        }
+        for uid, day, category_id, ctype, total, count in _raw_totals(user_id)
+    ]
+    if rows:
+        db.session.execute(db.insert(DailyRollup), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def check(user_id: Optional[int] = None) -> List[Tuple]:
+    raw = {
+        (uid, date.fromisoformat(day), category_id, ctype): (total, count)
+        for uid, day, category_id, ctype, total, count in _raw_totals(user_id)
+    }
+    query = DailyRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    rolled = {
+        (r.user_id, r.day, r.category_id, r.type): (r.total, r.count)
+        for r in query
+        if r.count
+    }
+    mismatches = []
+    for key in raw.keys() | rolled.keys():
+        expected = raw.get(key, (0, 0))
+        actual = rolled.get(key, (0, 0))
+        if expected != actual:
+            mismatches.append((key, expected, actual))
+    return mismatches
+
+
+def register_commands(app) -> None:
+    @app.cli.command("rollups-rebuild")
+    @click.option("--user-id", type=int, default=None)
+    def rollups_rebuild(user_id):
+        click.echo(f"Пересчитано строк сводки: {rebuild(user_id)}")
+
+    @app.cli.command("rollups-check")
+    @click.option("--user-id", type=int, default=None)
+    def rollups_check(user_id):
+        mismatches = check(user_id)
+        for key, expected, actual in mismatches:
+            click.echo(f"{key}: транзакции {expected}, сводка {actual}")
+        if mismatches:
+            raise SystemExit(1)
+        click.echo("Сводка совпадает с транзакциями.")
@@ -1,53 +1,56 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import date, datetime
+from datetime import datetime
 
+from utils.aggregates import budgets_over, expenses_by_user
 from utils.database import db
-from utils.models import User, Transaction, CategoryType
-from utils.helpers import get_category_spent
-from config import DAILY_SUMMARY_HOUR
+from utils.helpers import budget_alert_level, budget_alert_text
+from utils.metrics import job_metrics
+from utils.models import Budget
+from utils.money import format_minor
+from utils.rates import rates_service
+from config import BUDGET_ALERT_THRESHOLD, DAILY_SUMMARY_HOUR, JOB_CHUNK_SIZE, RATES_REFRESH_INTERVAL
 
 
-def send_daily_summary(bot, app):
+def send_daily_summary(outbox, app):
     with app.app_context():
-        today = date.today()
-        start = datetime.combine(today, datetime.min.time())
-        for user in User.query.all():
-            total = (db.session.query(db.func.sum(Transaction.amount))
-                     .filter_by(user_id=user.id, type=CategoryType.expense)
-                     .filter(Transaction.timestamp >= start)
-                     .scalar() or 0)
-            bot.send_message(
-                chat_id=user.telegram_id,
-                text=f"📊 Ежедневная сводка: {total:.2f} {user.currency}"
-            )
+        today = datetime.utcnow().date()
+        for telegram_id, currency, total in expenses_by_user(today):
+            outbox.enqueue(telegram_id, f"📊 Ежедневная сводка: {format_minor(total)} {currency}")
 
 
-def check_budgets(bot, app):
+def check_budgets(outbox, app):
+    # Оповещения отправляет create_transaction в момент записи; здесь только
+    # сверка: досылаем то, что было пропущено (импорт, смена лимита, новый месяц).
     with app.app_context():
-        for user in User.query.all():
-            for b in user.budgets:
-                spent = get_category_spent(user, b.category_id)
-                limit = b.amount
-                if limit <= 0:
-                    continue
-                pct = spent / limit * 100
-                if pct >= 80:
-                    msg = (
-                        f"⚠️ Бюджет «{b.category.name}»: {spent:.2f}/{limit:.2f} "
-                        f"{user.currency} ({pct:.0f}%)"
-                    )
-                    bot.send_message(chat_id=user.telegram_id, text=msg)
+        month_start = datetime.utcnow().date().replace(day=1)
+        month = month_start.strftime("%Y-%m")
+        updates = []
+        for row in budgets_over(month_start, BUDGET_ALERT_THRESHOLD):
+            budget_id, alert_level, alert_month, telegram_id, currency, name, spent, limit = row
+            level = budget_alert_level(spent, limit)
+            notified = alert_level if alert_month == month else 0
+            if level <= notified:
+                continue
+            outbox.enqueue(telegram_id, budget_alert_text(name, spent, limit, currency))
+            updates.append({"id": budget_id, "alert_level": level, "alert_month": month})
+        for i in range(0, len(updates), JOB_CHUNK_SIZE):
+            db.session.execute(db.update(Budget), updates[i:i + JOB_CHUNK_SIZE])
+        db.session.commit()
 
 
-def init_scheduler(bot, app):
+def init_scheduler(outbox, app):
     sched = BackgroundScheduler()
     sched.add_job(
-        send_daily_summary, 'cron', hour=DAILY_SUMMARY_HOUR, minute=0,
-        args=[bot, app], id='daily_summary'
+        job_metrics.wrap(send_daily_summary, 'daily_summary'), 'cron', hour=DAILY_SUMMARY_HOUR, minute=0,
+        args=[outbox, app], id='daily_summary'
     )
     sched.add_job(
-        check_budgets, 'cron', hour=9, minute=0,
-        args=[bot, app], id='check_budgets'
+        job_metrics.wrap(check_budgets, 'check_budgets'), 'cron', hour=9, minute=0,
+        args=[outbox, app], id='check_budgets'
+    )
+    sched.add_job(
+        job_metrics.wrap(rates_service.refresh_all, 'refresh_rates'), 'interval', seconds=RATES_REFRESH_INTERVAL,
+        next_run_time=datetime.now(), id='refresh_rates'
     )
     sched.start()
     return sched
@@ -1,30 +1,119 @@
+import asyncio
+import hashlib
 import io
-import matplotlib.pyplot as plt
+import multiprocessing
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+from config import CHART_CACHE_SIZE, CHART_WORKERS
+from utils.cache import TTLCache, register_invalidator
+from utils.metrics import registry
+
+# matplotlib импортируется внутри функций рендера: они выполняются в процессах
+# пула, и при старте бота библиотека не загружается.
+
+
+def _to_png(fig) -> bytes:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-def plot_monthly_category_bar(data):
-    names, values = zip(*data.items())
-    fig, ax = plt.subplots()
-    ax.bar(names, values)
-    ax.set_xticklabels(names, rotation=45, ha='right')
-    ax.set_title("Расходы по категориям за месяц")
     fig.tight_layout()
     buf = io.BytesIO()
-    fig.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    FigureCanvasAgg(fig).print_png(buf)
+    return buf.getvalue()
+
 
+def render_category_bar(data: Dict[str, float], title: str = "Расходы по категориям за месяц") -> bytes:
+    from matplotlib.figure import Figure
+
+    names, values = zip(*data.items())
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(names, values)
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    ax.set_title(title)
+    return _to_png(fig)
+
+
+def render_balance_trend(points: List[Tuple], title: str = "Тренд баланса за месяц") -> bytes:
+    from matplotlib.figure import Figure
 
-def plot_balance_trend(points):
     dates, balances = zip(*points)
-    fig, ax = plt.subplots()
+    fig = Figure()
+    ax = fig.subplots()
     ax.plot(dates, balances)
     fig.autofmt_xdate()
-    ax.set_title("Тренд баланса за месяц")
-    fig.tight_layout()
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    ax.set_title(title)
+    return _to_png(fig)
+
+
+chart_render_seconds = registry.histogram("finhelper_chart_render_seconds", "Рендер графика в пуле процессов", ("kind",))
+
+RENDERERS = {
+    "category_bar": render_category_bar,
+    "balance_trend": render_balance_trend,
+}
+
+
+class ChartRenderer:
+    def __init__(self, workers: int = CHART_WORKERS, cache_size: int = CHART_CACHE_SIZE):
+        self.workers = workers
+        self.cache = TTLCache(maxsize=cache_size, name="charts")
+        self.renders = 0
+        self.render_seconds = 0.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    @staticmethod
+    def key(kind: str, user_id: int, *args) -> tuple:
+        digest = hashlib.blake2b(pickle.dumps(args), digest_size=16).hexdigest()
+        return user_id, kind, digest
+
+    async def render(self, kind: str, user_id: int, *args) -> io.BytesIO:
+        key = self.key(kind, user_id, *args)
+        png = self.cache.get(key)
+        if png is None:
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self._executor(), RENDERERS[kind], *args)
+            elapsed = time.perf_counter() - started
+            self.renders += 1
+            self.render_seconds += elapsed
+            chart_render_seconds.observe(elapsed, kind)
+            self.cache.set(key, png)
+        return io.BytesIO(png)
+
+    def invalidate_user(self, user_id: int) -> int:
+        return self.cache.pop_where(lambda key: key[0] == user_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        stats.update({
+            "renders": self.renders,
+            "render_seconds_total": self.render_seconds,
+            "render_seconds_avg": self.render_seconds / self.renders if self.renders else 0.0,
+        })
+        return stats
+
+
+chart_renderer = ChartRenderer()
+register_invalidator(chart_renderer.invalidate_user)